@@ -0,0 +1,255 @@
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from .database import (entry_timestamp, entry_category, entry_minutes, entry_planned_minutes,
+                       entry_pause_seconds, read_log_since)
+from .rollups import week_key
+
+# Pause length histogram edges, in seconds
+PAUSE_BINS = [0, 30, 60, 120, 300, 600, 1800, 3600, float("inf")]
+
+# Distinct (since, until) results kept between appends
+MAX_MEMO_ENTRIES = 32
+
+# Range of a summary without `since`
+DEFAULT_SPAN_DAYS = 28
+# Longest range a summary covers; earlier days of a longer range are dropped
+MAX_SPAN_DAYS = 3660
+
+class Columns:
+    """
+    Append-only columnar copy of a log: one NumPy array per field. New entries
+    are buffered as Python lists and folded into the arrays on the next read.
+    """
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.dtypes = fields
+        self.arrays: Dict[str, np.ndarray] = {name: np.empty(0, dtype=dtype) for name, dtype in fields.items()}
+        self._pending: Dict[str, list] = {name: [] for name in fields}
+
+    def append(self, **values: Any) -> None:
+        for name, value in values.items():
+            self._pending[name].append(value)
+
+    def compact(self) -> None:
+        if not next(iter(self._pending.values())):
+            return
+        for name, dtype in self.dtypes.items():
+            self.arrays[name] = np.concatenate([self.arrays[name], np.array(self._pending[name], dtype=dtype)])
+            self._pending[name] = []
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+class AnalyticsEngine:
+    """
+    Vectorized analytics over the history and pause logs.
+    Both logs are loaded into columns once and then followed with log cursors
+    (`read_log` is the store's cursor reader), so only appended entries are
+    parsed. Results are memoized per query and dropped when either log grows.
+    """
+
+    def __init__(self, read_log: Callable[[str, Optional[int]], Tuple[List[Dict[str, Any]], int]] = read_log_since):
+        self.read_log = read_log
+        self._lock = threading.Lock()
+        self.categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        # day = local date ordinal, hour = local hour of day
+        self.history = Columns({"ts": np.float64, "day": np.int32, "category": np.int32,
+                                "actual": np.float64, "planned": np.float64})
+        self.pauses = Columns({"ts": np.float64, "day": np.int32, "hour": np.int8,
+                               "category": np.int32, "seconds": np.float64})
+        self._cursors: Dict[str, Optional[int]] = {"history": None, "pause_log": None}
+        self._memo: Dict[Tuple, Dict[str, Any]] = {}
+
+    def _code(self, category: Optional[str]) -> int:
+        name = category or "Uncategorized"
+        if name not in self._category_codes:
+            self._category_codes[name] = len(self.categories)
+            self.categories.append(name)
+        return self._category_codes[name]
+
+    def catch_up(self) -> Tuple[int, int]:
+        """
+        Loads entries appended since the last call. Returns the version (cursors).
+        """
+        with self._lock:
+            entries, self._cursors["history"] = self.read_log("history", self._cursors["history"])
+            for entry in entries:
+                ts = entry_timestamp(entry)
+                if ts is None:
+                    continue
+                planned = entry_planned_minutes(entry)
+                self.history.append(ts=ts, day=datetime.fromtimestamp(ts).toordinal(),
+                                    category=self._code(entry_category(entry)),
+                                    actual=entry_minutes(entry),
+                                    planned=np.nan if planned is None else planned)
+
+            pauses, self._cursors["pause_log"] = self.read_log("pause_log", self._cursors["pause_log"])
+            for entry in pauses:
+                ts = entry_timestamp(entry)
+                seconds = entry_pause_seconds(entry)
+                if ts is None or seconds is None:
+                    continue
+                local = datetime.fromtimestamp(ts)
+                self.pauses.append(ts=ts, day=local.toordinal(), hour=local.hour,
+                                   category=self._code(entry_category(entry)), seconds=seconds)
+
+            if entries or pauses:
+                self.history.compact()
+                self.pauses.compact()
+                self._memo.clear()
+            return self._cursors["history"] or 0, self._cursors["pause_log"] or 0
+
+    def summary(self, since: Optional[date] = None, until: Optional[date] = None) -> Dict[str, Any]:
+        """
+        All analytics for local days in [since, until] (default: the last 28 days).
+        Longer ranges start no earlier than the first logged entry and span at
+        most MAX_SPAN_DAYS. Raises ValueError if since is after until.
+        """
+        until = until or date.today()
+        default_start = max(1, until.toordinal() - DEFAULT_SPAN_DAYS + 1)
+        since = since or date.fromordinal(default_start)
+        if since > until:
+            raise ValueError("since is after until")
+        version = self.catch_up()
+        with self._lock:
+            first = self._first_day()
+            start = since.toordinal()
+            if first is not None:
+                start = max(start, min(first, default_start))
+            since = date.fromordinal(max(start, until.toordinal() - MAX_SPAN_DAYS + 1))
+            key = (version, since, until)
+            if key not in self._memo:
+                if len(self._memo) >= MAX_MEMO_ENTRIES:
+                    self._memo.clear()
+                self._memo[key] = {
+                    "since": since.isoformat(),
+                    "until": until.isoformat(),
+                    "time_by_category": self._time_by_category(since.toordinal(), until.toordinal()),
+                    "drift": self._drift(since.toordinal(), until.toordinal()),
+                    "pauses": self._pauses(since.toordinal(), until.toordinal()),
+                    "streaks": self._streaks(until.toordinal()),
+                }
+            return self._memo[key]
+
+    # --- Computations (callers hold the lock) ---
+
+    def _first_day(self) -> Optional[int]:
+        days = [int(c["day"].min()) for c in (self.history, self.pauses) if len(c["day"])]
+        return min(days) if days else None
+
+    def _time_by_category(self, first: int, last: int) -> Dict[str, Any]:
+        h = self.history
+        mask = (h["day"] >= first) & (h["day"] <= last)
+        days, codes, minutes = h["day"][mask] - first, h["category"][mask], h["actual"][mask]
+        n_days, n_cats = last - first + 1, len(self.categories)
+
+        # One bincount over (day, category) cells gives the whole day x category matrix
+        grid = np.bincount(days * n_cats + codes, weights=minutes, minlength=n_days * n_cats).reshape(n_days, n_cats)
+
+        # Collapse days into ISO weeks (Monday ordinals)
+        ordinals = np.arange(first, last + 1)
+        mondays = ordinals - (ordinals - 1) % 7
+        week_starts, week_index = np.unique(mondays, return_inverse=True)
+        weekly = np.zeros((len(week_starts), n_cats))
+        np.add.at(weekly, week_index, grid)
+
+        used = np.flatnonzero(grid.sum(axis=0))
+        names = [self.categories[i] for i in used]
+        return {
+            "categories": names,
+            "daily": {
+                date.fromordinal(int(first + i)).isoformat(): _by_name(names, grid[i, used])
+                for i in range(n_days)
+            },
+            "weekly": {
+                week_key(date.fromordinal(int(monday))): _by_name(names, weekly[i, used])
+                for i, monday in enumerate(week_starts)
+            },
+            "totals": _by_name(names, grid[:, used].sum(axis=0)),
+        }
+
+    def _drift(self, first: int, last: int) -> Dict[str, Any]:
+        h = self.history
+        mask = (h["day"] >= first) & (h["day"] <= last) & ~np.isnan(h["planned"]) & (h["planned"] > 0)
+        planned, actual, codes = h["planned"][mask], h["actual"][mask], h["category"][mask]
+        result = {"overall": _drift_stats(planned, actual), "by_category": {}}
+        for code in np.unique(codes):
+            selected = codes == code
+            result["by_category"][self.categories[code]] = _drift_stats(planned[selected], actual[selected])
+        return result
+
+    def _pauses(self, first: int, last: int) -> Dict[str, Any]:
+        p = self.pauses
+        mask = (p["day"] >= first) & (p["day"] <= last)
+        seconds, hours, days = p["seconds"][mask], p["hour"][mask], p["day"][mask]
+
+        h = self.history
+        sessions = int(np.count_nonzero((h["day"] >= first) & (h["day"] <= last)))
+        counts, _ = np.histogram(seconds, bins=PAUSE_BINS)
+        return {
+            "count": int(len(seconds)),
+            "per_day": round(len(seconds) / (last - first + 1), 3),
+            "per_session": round(len(seconds) / sessions, 3) if sessions else None,
+            "active_days": int(len(np.unique(days))),
+            "seconds": _distribution(seconds),
+            "histogram": [
+                {"min_seconds": lo, "max_seconds": None if hi == float("inf") else hi, "count": int(c)}
+                for lo, hi, c in zip(PAUSE_BINS[:-1], PAUSE_BINS[1:], counts)
+            ],
+            "by_hour": np.bincount(hours.astype(np.int64), minlength=24).tolist(),
+        }
+
+    def _streaks(self, today: int) -> Dict[str, Any]:
+        h = self.history
+        active = h["actual"] > 0
+        result = {"overall": _streak(np.unique(h["day"][active]), today), "by_category": {}}
+        for code in np.unique(h["category"][active]):
+            days = np.unique(h["day"][active & (h["category"] == code)])
+            result["by_category"][self.categories[code]] = _streak(days, today)
+        return result
+
+def _by_name(names: List[str], minutes: np.ndarray) -> Dict[str, float]:
+    return {name: round(float(m), 2) for name, m in zip(names, minutes)}
+
+def _distribution(values: np.ndarray) -> Optional[Dict[str, float]]:
+    if len(values) == 0:
+        return None
+    p50, p90 = np.percentile(values, [50, 90])
+    return {"mean": round(float(values.mean()), 2), "p50": round(float(p50), 2),
+            "p90": round(float(p90), 2), "max": round(float(values.max()), 2)}
+
+def _drift_stats(planned: np.ndarray, actual: np.ndarray) -> Dict[str, Any]:
+    """
+    Actual minus planned minutes (positive = ran over), and actual/planned ratio.
+    """
+    if len(planned) == 0:
+        return {"sessions": 0}
+    drift = actual - planned
+    return {
+        "sessions": int(len(planned)),
+        "drift_minutes": _distribution(drift),
+        "mean_ratio": round(float((actual / planned).mean()), 3),
+        "over_share": round(float((drift > 0).mean()), 3),
+        "under_share": round(float((drift < 0).mean()), 3),
+    }
+
+def _streak(days: np.ndarray, today: int) -> Dict[str, Any]:
+    """
+    Longest run of consecutive active days, and the current one (ending today,
+    or yesterday if today has no activity yet). `days` is sorted and unique.
+    """
+    if len(days) == 0:
+        return {"current": 0, "longest": 0, "last_active": None}
+    # Runs split wherever consecutive active days are more than one day apart
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(days) - 1]])
+    lengths = ends - starts + 1
+    current = int(lengths[-1]) if days[-1] >= today - 1 else 0
+    return {"current": current, "longest": int(lengths.max()),
+            "last_active": date.fromordinal(int(days[-1])).isoformat()}
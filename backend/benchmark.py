@@ -0,0 +1,301 @@
+"""
+Offline benchmark suite for the backend.
+
+Runs the FastAPI app in-process against fake Todoist and Gemma services
+(see fakes.py) and synthetic history/event logs, so it needs no network or
+API keys. Each log size runs in its own subprocess with its own data
+directory (KAIROS_DATA_DIR), since the stores are module-level singletons.
+
+    python -m backend.benchmark                       # 10k and 100k entries
+    python -m backend.benchmark --sizes 10k,100k,1m
+    python -m backend.benchmark --save-baseline       # record the current numbers
+    python -m backend.benchmark --check               # exit 1 on a regression
+
+Reports p50/p99 latency, throughput and error rate per scenario and compares
+them with the stored baseline (benchmarks/baseline.json).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Any
+
+import numpy as np
+
+REPO_DIR = Path(__file__).parent.parent
+DEFAULT_BASELINE = REPO_DIR / "benchmarks" / "baseline.json"
+
+CATEGORIES = ["Work", "Study", "Health", "Chores", "Social"]
+SCENARIOS = ["tasks", "tasks_refresh", "history_page", "history_append", "weekly_stats", "analytics", "log_event", "session"]
+
+# A scenario is an async function making one logical request with the client
+Scenario = Callable[[Any, int], Awaitable[None]]
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def format_size(size: int) -> str:
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f"{size // 1_000_000}m"
+    if size >= 1_000 and size % 1_000 == 0:
+        return f"{size // 1_000}k"
+    return str(size)
+
+# --- Synthetic data ---
+
+def write_synthetic_data(data_dir: Path, entries: int, seed: int = 0) -> None:
+    """
+    config.json plus history.jsonl and event_log.jsonl with `entries` records
+    each, spread over the last year.
+    """
+    rng = random.Random(seed)
+    config = {
+        "categories": [{"name": c, "target_hours": 5, "priority": 1 + i % 3} for i, c in enumerate(CATEGORIES)],
+        "free_time_chance": 0.0,
+    }
+    (data_dir / "config.json").write_text(json.dumps(config, indent=2), encoding="utf-8")
+
+    now = time.time()
+    with open(data_dir / "history.jsonl", "w", encoding="utf-8") as history, \
+         open(data_dir / "event_log.jsonl", "w", encoding="utf-8") as events:
+        for i in range(entries):
+            ts = now - rng.random() * 365 * 86400
+            category = rng.choice(CATEGORIES)
+            history.write(json.dumps({
+                "task_name": f"Task {i % 500}",
+                "category": category,
+                "start_time": ts,
+                "end_time": ts + 1500,
+                "duration_minutes": 25,
+                "actual_duration": rng.randint(5, 60),
+                "feedback": "ok",
+            }) + "\n")
+            events.write(json.dumps({
+                "type": rng.choice(["start", "pause", "resume", "stop"]),
+                "task_name": f"Task {i % 500}",
+                "category": category,
+                "timestamp": ts,
+            }) + "\n")
+
+# --- Scenarios ---
+
+async def scenario_tasks(client, i: int) -> None:
+    (await client.post("/tasks")).raise_for_status()
+
+async def scenario_tasks_refresh(client, i: int) -> None:
+    (await client.post("/tasks", params={"refresh": "true"})).raise_for_status()
+
+async def scenario_history_page(client, i: int) -> None:
+    since = time.time() - 7 * 86400
+    (await client.get("/history", params={"since": since, "limit": 100})).raise_for_status()
+
+async def scenario_history_append(client, i: int) -> None:
+    now = time.time()
+    entry = {"task_name": f"Bench {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+             "start_time": now - 1500, "end_time": now, "actual_duration": 25}
+    (await client.post("/history", json=entry)).raise_for_status()
+
+async def scenario_weekly_stats(client, i: int) -> None:
+    (await client.get("/stats/weekly")).raise_for_status()
+
+async def scenario_analytics(client, i: int) -> None:
+    (await client.get("/analytics")).raise_for_status()
+
+async def scenario_log_event(client, i: int) -> None:
+    entry = {"type": "pause", "task_name": f"Bench {i}", "timestamp": time.time()}
+    (await client.post("/log_event", json=entry)).raise_for_status()
+
+async def scenario_session(client, i: int) -> None:
+    # One full session lifecycle per iteration; concurrent so iterations don't stop each other's sessions
+    session = {"task_name": f"Bench {i}", "category": "Work", "duration_minutes": 25, "start_time": 0}
+    response = await client.post("/session/start", params={"concurrent": "true"}, json=session)
+    response.raise_for_status()
+    session_id = response.json()["session"]["session_id"]
+    (await client.get("/session/current")).raise_for_status()
+    (await client.post("/session/extend", json={"minutes": 5, "session_id": session_id})).raise_for_status()
+    (await client.post("/session/stop", params={"session_id": session_id})).raise_for_status()
+
+SCENARIO_FUNCS: Dict[str, Scenario] = {
+    "tasks": scenario_tasks,
+    "tasks_refresh": scenario_tasks_refresh,
+    "history_page": scenario_history_page,
+    "history_append": scenario_history_append,
+    "weekly_stats": scenario_weekly_stats,
+    "analytics": scenario_analytics,
+    "log_event": scenario_log_event,
+    "session": scenario_session,
+}
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await scenario(client, i)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    # Latencies cover successful requests only; with none there is nothing to report
+    values = np.array(latencies) * 1000
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "p50_ms": round(float(np.percentile(values, 50)), 3) if latencies else None,
+        "p99_ms": round(float(np.percentile(values, 99)), 3) if latencies else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+# --- Worker (one log size, fresh process) ---
+
+async def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    # KAIROS_DATA_DIR is set by the parent before this process imported backend
+    import httpx
+    from . import gemini_client, main
+    from .fakes import FakeGemma, FakeGenaiClient, FakeTodoistAPI, RecordingNotifier, make_tasks
+
+    workspace = main.workspaces.default
+    workspace.todoist.api = FakeTodoistAPI(
+        make_tasks(args.tasks, CATEGORIES, seed=1),
+        latency=args.todoist_latency, failure_rate=args.failure_rate, churn=args.churn, seed=2)
+    gemini_client._client = FakeGenaiClient(FakeGemma(latency=args.gemma_latency, failure_rate=args.failure_rate, seed=3))
+    workspace.session_scheduler.notifier = RecordingNotifier()
+
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            for name in args.scenarios:
+                requests = args.refresh_requests if name == "tasks_refresh" else args.requests
+                # Warm up caches and code paths outside the measurement
+                await run_scenario(client, SCENARIO_FUNCS[name], min(5, requests), 1)
+                results[name] = await run_scenario(client, SCENARIO_FUNCS[name], requests, args.concurrency)
+    return results
+
+def run_size(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="kairos-bench-") as data_dir:
+        started = time.perf_counter()
+        write_synthetic_data(Path(data_dir), size)
+        print(f"Generated {format_size(size)} history/event entries in {time.perf_counter() - started:.1f}s")
+
+        env = {**os.environ, "KAIROS_DATA_DIR": data_dir, "TODOIST_API_KEY": "benchmark",
+               "GEMINI_API_KEY": "benchmark", "KAIROS_TODOIST_SYNC": "full"}
+        command = [sys.executable, "-m", "backend.benchmark", "--worker",
+                   "--scenarios", ",".join(args.scenarios),
+                   "--requests", str(args.requests), "--refresh-requests", str(args.refresh_requests),
+                   "--concurrency", str(args.concurrency), "--tasks", str(args.tasks),
+                   "--todoist-latency", str(args.todoist_latency), "--gemma-latency", str(args.gemma_latency),
+                   "--failure-rate", str(args.failure_rate), "--churn", str(args.churn)]
+        output = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(output.stdout[-2000:])
+            print(output.stderr[-2000:])
+            raise RuntimeError(f"Benchmark worker for {format_size(size)} failed")
+        # The worker's result is its last stdout line; the rest is app logging
+        return json.loads(output.stdout.strip().splitlines()[-1])
+
+# --- Reporting ---
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions against the baseline: p99 latency more than `tolerance` higher,
+    or throughput more than `tolerance` lower. Any errors beyond the baseline's
+    error rate (zero without a baseline) count too, so a failing scenario can't
+    pass on the latency of the few requests that succeeded.
+    """
+    regressions = []
+    for size, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get(size, {}).get(name)
+            allowed_error_rate = previous.get("error_rate", 0.0) if previous else 0.0
+            if current["error_rate"] > allowed_error_rate:
+                regressions.append(f"{size}/{name}: {current['errors']} of {current['requests']} requests failed")
+            if not previous or current["p99_ms"] is None or previous.get("p99_ms") is None:
+                continue
+            if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{size}/{name}: p99 {previous['p99_ms']:.2f}ms -> {current['p99_ms']:.2f}ms")
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{size}/{name}: throughput {previous['throughput_rps']:.0f} -> {current['throughput_rps']:.0f} req/s")
+    return regressions
+
+def print_table(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n{'size':>6} {'scenario':<16} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>6}  vs baseline p99")
+    for size, scenarios in results.items():
+        for name, r in scenarios.items():
+            previous = baseline.get(size, {}).get(name)
+            delta = "-"
+            if previous and previous.get("p99_ms") and r["p99_ms"] is not None:
+                delta = f"{(r['p99_ms'] / previous['p99_ms'] - 1) * 100:+.0f}%"
+            p50, p99 = (f"{v:.2f}" if v is not None else "-" for v in (r["p50_ms"], r["p99_ms"]))
+            print(f"{size:>6} {name:<16} {p50:>9} {p99:>9} {r['throughput_rps']:>9.0f} {r['errors']:>6}  {delta}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline Kairos backend benchmarks")
+    parser.add_argument("--sizes", default="10k,100k", help="history/event log sizes, e.g. 10k,100k,1m")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--refresh-requests", type=int, default=20, help="requests for tasks_refresh")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=300, help="tasks in the fake Todoist account")
+    parser.add_argument("--todoist-latency", type=float, default=0.05, help="seconds per fake Todoist call")
+    parser.add_argument("--gemma-latency", type=float, default=0.2, help="seconds per fake Gemma call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake calls that fail")
+    parser.add_argument("--churn", type=float, default=0.02, help="fraction of tasks renamed per Todoist fetch")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(args))))
+        return
+
+    results = {}
+    for size in (parse_size(s) for s in args.sizes.split(",")):
+        results[format_size(size)] = run_size(size, args)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.baseline}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        if args.check:
+            sys.exit(1)
+    elif baseline:
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
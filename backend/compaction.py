@@ -0,0 +1,78 @@
+"""
+Rotates the JSONL logs and folds old raw events into daily summaries.
+
+    python -m backend.compaction [--older-than-days 90] [--dry-run] [--workspace NAME]
+
+Rotation also happens on its own when a log is appended to; this command
+additionally archives logs that are due but idle. Compaction applies to the
+event log only: history and the pause log feed the rollups and analytics
+entry by entry, so they are archived but never summarized.
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from .database import STORAGE_BACKEND, DataStore, default_store, entry_category, entry_timestamp
+from .workspaces import DEFAULT_WORKSPACE, WORKSPACES_DIR, WorkspaceRegistry
+
+DEFAULT_COMPACT_AFTER_DAYS = 90
+
+def summarize_events(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One record per (local day, event type, category) with the count and the
+    first/last timestamp. Entries without a timestamp are kept as they are.
+    """
+    summaries: Dict[Tuple, Dict[str, Any]] = {}
+    kept = []
+    for entry in entries:
+        ts = entry_timestamp(entry)
+        if ts is None or entry.get("type") == "summary":
+            kept.append(entry)
+            continue
+        day = datetime.fromtimestamp(ts).date().isoformat()
+        key = (day, entry.get("type") or entry.get("event"), entry_category(entry))
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = {
+                "type": "summary", "date": day, "event": key[1], "category": key[2],
+                "count": 0, "timestamp": ts, "last_timestamp": ts,
+            }
+        summary["count"] += 1
+        summary["timestamp"] = min(summary["timestamp"], ts)
+        summary["last_timestamp"] = max(summary["last_timestamp"], ts)
+    return kept + sorted(summaries.values(), key=lambda s: s["timestamp"])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=float, default=DEFAULT_COMPACT_AFTER_DAYS,
+                        help="summarize archived event segments entirely older than this")
+    parser.add_argument("--dry-run", action="store_true", help="only list the archive")
+    parser.add_argument("--workspace", help="workspace to compact (default: all)")
+    args = parser.parse_args()
+
+    if STORAGE_BACKEND == "sqlite":
+        print("KAIROS_STORAGE=sqlite: rotation and compaction apply to the JSONL logs only.")
+        return
+
+    existing = WorkspaceRegistry().names()
+    if args.workspace and args.workspace not in existing:
+        parser.error(f"no workspace named {args.workspace}")
+    before = time.time() - args.older_than_days * 86400
+    for workspace in [args.workspace] if args.workspace else existing:
+        data = default_store if workspace == DEFAULT_WORKSPACE else DataStore(WORKSPACES_DIR / workspace)
+        print(f"[{workspace}]")
+        logs = data.logs
+        for name, log in logs.items():
+            if not args.dry_run and log.rotate():
+                print(f"Rotated {name}")
+            segments = log.segments()
+            compacted = sum(1 for s in segments if s.get("compacted"))
+            print(f"{name}: {len(segments)} archived segments ({compacted} compacted)")
+
+        if not args.dry_run:
+            count = logs["event_log"].compact(before, summarize_events)
+            print(f"Compacted {count} event_log segments older than {args.older_than_days:g} days")
+
+if __name__ == "__main__":
+    main()
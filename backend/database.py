@@ -1,14 +1,52 @@
+import copy
+import gzip
 import json
 import os
+import tempfile
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
 
-BASE_DIR = Path(__file__).parent.parent
+from . import metrics
+from .locks import lock_for
+
+# KAIROS_DATA_DIR relocates every data file (used by the benchmarks)
+BASE_DIR = Path(os.environ.get("KAIROS_DATA_DIR") or Path(__file__).parent.parent)
 CONFIG_FILE = BASE_DIR / "config.json"
 HISTORY_FILE = BASE_DIR / "history.json"
 CACHE_FILE = BASE_DIR / "task_cache.json"
 PAUSE_LOG_FILE = BASE_DIR / "pause_log.json"
 EVENT_LOG_FILE = BASE_DIR / "event_log.json"
+SESSIONS_FILE = BASE_DIR / "sessions.json"
+
+# Append-only logs (one JSON record per line). The *.json files above are the
+# legacy array format and are migrated into these on first access.
+HISTORY_LOG_FILE = BASE_DIR / "history.jsonl"
+PAUSE_LOG_LOG_FILE = BASE_DIR / "pause_log.jsonl"
+EVENT_LOG_LOG_FILE = BASE_DIR / "event_log.jsonl"
+
+# fsync after every append. Off by default: appends are already crash-safe
+# (a torn last line is skipped on read), this only guards against power loss.
+FSYNC_LOGS = os.environ.get("KAIROS_FSYNC", "0") == "1"
+
+# The live JSONL files roll over into gzip segments under archive/ past this
+# size (MB), and when a new calendar month starts
+LOG_ROTATE_BYTES = int(float(os.environ.get("KAIROS_LOG_ROTATE_MB", "16")) * 1024 * 1024)
+# A rotated file spanning more months than this (out-of-order timestamps) is
+# archived as a single segment
+MAX_ROTATION_SEGMENTS = 36
+
+# "json" (JSONL logs + JSON files) or "sqlite" (indexed kairos.db)
+STORAGE_BACKEND = os.environ.get("KAIROS_STORAGE", "json").lower()
+SQLITE_FILE = BASE_DIR / "kairos.db"
+
+# Seconds between stat() checks on cached JSON files, and the debounce window
+# for write-behind flushes of the task cache.
+CACHE_STAT_INTERVAL = 1.0
+CACHE_FLUSH_DELAY = 2.0
+CACHE_FLUSH_MAX_DELAY = 10.0
 
 DEFAULT_CONFIG = {
     "categories": [
@@ -18,46 +56,792 @@ DEFAULT_CONFIG = {
     "free_time_chance": 0.05
 }
 
+def parse_timestamp(value: Any) -> Optional[float]:
+    """
+    Normalizes a timestamp (Unix seconds/milliseconds or ISO 8601 string) to Unix seconds.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        # Frontend Date.now() values are in milliseconds
+        return value / 1000.0 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            return parse_timestamp(float(value))
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+def entry_timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    for key in ("timestamp", "end_time", "start_time", "date"):
+        if key in entry:
+            ts = parse_timestamp(entry[key])
+            if ts is not None:
+                return ts
+    return None
+
+def _number(entry: Dict[str, Any], keys: Tuple[str, ...]) -> Optional[float]:
+    for key in keys:
+        value = entry.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                continue
+    return None
+
+def entry_category(entry: Dict[str, Any]) -> Optional[str]:
+    return entry.get("category")
+
+def entry_task_name(entry: Dict[str, Any]) -> Optional[str]:
+    return entry.get("task_name") or entry.get("task")
+
+def entry_minutes(entry: Dict[str, Any]) -> float:
+    """
+    Time actually spent on a history entry, in minutes.
+    """
+    minutes = _number(entry, ("actual_duration", "actual_minutes", "actual_time", "duration_minutes", "duration"))
+    return minutes or 0.0
+
+def entry_planned_minutes(entry: Dict[str, Any]) -> Optional[float]:
+    """
+    Timer length the session was planned for, in minutes, if the entry records
+    both a planned and an actual duration (else there is nothing to compare).
+    """
+    if _number(entry, ("actual_duration", "actual_minutes", "actual_time")) is None:
+        return None
+    return _number(entry, ("planned_duration", "planned_minutes", "duration_minutes", "duration"))
+
+def entry_pause_seconds(entry: Dict[str, Any]) -> Optional[float]:
+    """
+    Length of a pause-log entry in seconds: end - start when both are recorded,
+    else an explicit duration (`*_seconds`/`pause_duration` in seconds,
+    `duration_minutes` in minutes).
+    """
+    start = parse_timestamp(entry.get("pause_start", entry.get("start_time")))
+    end = parse_timestamp(entry.get("pause_end", entry.get("end_time")))
+    if start is not None and end is not None and end >= start:
+        return end - start
+    seconds = _number(entry, ("pause_duration", "duration_seconds", "pause_seconds"))
+    if seconds is not None:
+        return seconds
+    minutes = _number(entry, ("duration_minutes",))
+    return minutes * 60 if minutes is not None else None
+
 def _load_json(path: Path, default: Any) -> Any:
     if not path.exists():
         _save_json(path, default)
         return default
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        raw = f.read()
+    metrics.store_bytes.inc(path.name, "read", amount=len(raw))
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+        return json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
         return default
+    finally:
+        metrics.store_duration.observe(time.perf_counter() - started, path.name, "read")
+
+def _read_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Mode open() would give a new file; mkstemp always creates 0600
+_NEW_FILE_MODE = 0o666 & ~_read_umask()
 
 def _save_json(path: Path, data: Any) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    """
+    Atomic write: dump to a temp file in the same directory, then rename over the
+    target so readers never see a half-written file. The target keeps its mode.
+    """
+    started = time.perf_counter()
+    payload = json.dumps(data, indent=2).encode("utf-8")
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = path.stat().st_mode & 0o777
+        except FileNotFoundError:
+            mode = _NEW_FILE_MODE
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    metrics.store_bytes.inc(path.name, "write", amount=len(payload))
+    metrics.store_duration.observe(time.perf_counter() - started, path.name, "write")
+
+def _file_signature(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class CachedJsonFile:
+    """
+    Parsed JSON file held in memory for the whole process.
+    The file is re-parsed only when its mtime/size changes (checked at most every
+    CACHE_STAT_INTERVAL seconds), so the common read path does no disk I/O.
+    Writes are either immediate (`set`) or deferred and debounced (`set_deferred`).
+    With `merge`, a write folds in changes another process made in the meantime;
+    for dict files, keys we removed since our last read or write stay removed.
+    """
+
+    def __init__(self, path: Path, default: Any,
+                 flush_delay: float = CACHE_FLUSH_DELAY,
+                 max_flush_delay: float = CACHE_FLUSH_MAX_DELAY,
+                 stat_interval: float = CACHE_STAT_INTERVAL,
+                 merge: Optional[Callable[[Any, Any], Any]] = None):
+        self.path = path
+        self.default = default
+        self.merge = merge
+        self._file_lock = lock_for(path)
+        self.flush_delay = flush_delay
+        self.max_flush_delay = max_flush_delay
+        self.stat_interval = stat_interval
+        self._lock = threading.RLock()
+        self._data: Any = None
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._dirty_since: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        # Keys of the dict as last read from or written to disk
+        self._persisted_keys: Set[str] = set()
+
+    def get(self) -> Any:
+        """
+        Returns the shared in-memory object. Callers that modify it must pass it
+        back through `set`/`set_deferred` for the change to be persisted.
+        """
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < self.stat_interval:
+            return self._data
+
+        with self._lock:
+            self._checked_at = now
+            signature = _file_signature(self.path)
+            # Never let a reload clobber writes that haven't been flushed yet
+            if self._data is None or (signature != self._signature and self._dirty_since is None):
+                self._data = _load_json(self.path, copy.deepcopy(self.default))
+                self._signature = _file_signature(self.path)
+                self._persisted_keys = set(self._data) if isinstance(self._data, dict) else set()
+            return self._data
+
+    def version(self) -> Optional[str]:
+        """
+        Identifies the current contents (the file's mtime/size), e.g. for HTTP
+        ETags. None while changes are waiting to be flushed.
+        """
+        self.get()
+        with self._lock:
+            if self._dirty_since is not None or self._signature is None:
+                return None
+            return f"{self._signature[0]}-{self._signature[1]}"
+
+    def set(self, data: Any) -> None:
+        with self._lock:
+            self._cancel_timer()
+            self._data = data
+            self._write()
+
+    def set_deferred(self, data: Any) -> None:
+        with self._lock:
+            self._data = data
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+
+            # Debounce, but don't let a steady stream of updates postpone the
+            # flush past max_flush_delay.
+            delay = min(self.flush_delay, max(0.0, self._dirty_since + self.max_flush_delay - now))
+            self._cancel_timer()
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._cancel_timer()
+            if self._dirty_since is not None:
+                self._write()
+
+    def _write(self) -> None:
+        # The file lock makes read-merge-write atomic across worker processes
+        with self._file_lock:
+            signature = _file_signature(self.path)
+            if self.merge is not None and signature is not None and signature != self._signature:
+                # Another process wrote since we last read: fold its changes in
+                on_disk = _load_json(self.path, copy.deepcopy(self.default))
+                if isinstance(on_disk, dict) and isinstance(self._data, dict):
+                    # ...but not the entries we evicted or invalidated
+                    removed = self._persisted_keys - self._data.keys()
+                    on_disk = {k: v for k, v in on_disk.items() if k not in removed}
+                self._data = self.merge(on_disk, self._data)
+            _save_json(self.path, self._data)
+            self._signature = _file_signature(self.path)
+            self._persisted_keys = set(self._data) if isinstance(self._data, dict) else set()
+        self._checked_at = time.monotonic()
+        self._dirty_since = None
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+class JsonlLog:
+    """
+    Append-only log stored as one JSON record per line.
+    Appends cost O(entry) instead of rewriting the whole file, and a crash can at
+    worst leave a partial last line, which is ignored when reading.
+
+    The live file rolls over into gzip segments under `archive_dir` once it
+    passes `rotate_bytes` or a new calendar month starts. A manifest records
+    each segment's byte range and time range, so byte cursors stay valid across
+    rotations, reads past the last rotation touch only the live file, and time
+    range queries open only the segments that overlap.
+    """
+
+    def __init__(self, path: Path, legacy_path: Optional[Path] = None, fsync: bool = FSYNC_LOGS,
+                 archive_dir: Optional[Path] = None, rotate_bytes: int = LOG_ROTATE_BYTES):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync = fsync
+        self.archive_dir = archive_dir or path.parent / "archive"
+        self.manifest_path = self.archive_dir / f"{path.stem}.manifest.json"
+        self.rotate_bytes = rotate_bytes
+        # Serializes appends, rotation and the one-time migration across threads and processes
+        self._lock = lock_for(path)
+        self._ready = False
+        self._manifest_data: Optional[Dict[str, Any]] = None
+        self._manifest_signature: Optional[tuple] = None
+        self._live_month: Optional[Tuple[tuple, Optional[str]]] = None
+
+    def _prepare(self) -> None:
+        """
+        One-time setup: migrate the legacy JSON array, finish a rotation that
+        was interrupted by a crash, and make sure the file ends with a newline
+        so a torn record can't swallow the next append.
+        Must be called with the lock held.
+        """
+        if self._ready:
+            return
+
+        if self.legacy_path and self.legacy_path.exists() and not self.path.exists():
+            try:
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    legacy_entries = json.load(f)
+            except json.JSONDecodeError:
+                legacy_entries = []
+            if not isinstance(legacy_entries, list):
+                legacy_entries = []
+
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(_encode_lines(legacy_entries))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.legacy_path.rename(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+            print(f"Migrated {len(legacy_entries)} entries from {self.legacy_path.name} to {self.path.name}")
+
+        # A live file moved into the archive but not yet recorded in the manifest
+        manifest = self._manifest()
+        for raw_path in sorted(self.archive_dir.glob(f"{self.path.stem}-*.jsonl")):
+            if raw_path.name + ".gz" in {s["file"] for s in manifest["segments"]}:
+                raw_path.unlink()
+            else:
+                self._archive(raw_path)
+
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+        self._ready = True
+
+    # --- Manifest ---
+
+    def _manifest(self) -> Dict[str, Any]:
+        """
+        {"base": bytes archived so far, "next_seq": int, "segments": [...]}. Each
+        segment has its file name, logical `offset`/`length` in bytes, `entries`
+        count and `first_ts`/`last_ts`. Re-read only when the file changes.
+        """
+        signature = _file_signature(self.manifest_path)
+        if self._manifest_data is None or signature != self._manifest_signature:
+            manifest = {"base": 0, "next_seq": 1, "segments": []}
+            if signature is not None:
+                loaded = _load_json(self.manifest_path, manifest)
+                if isinstance(loaded, dict) and "segments" in loaded:
+                    manifest = loaded
+            self._manifest_data = manifest
+            self._manifest_signature = signature
+        return self._manifest_data
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        _save_json(self.manifest_path, manifest)
+        self._manifest_data = manifest
+        self._manifest_signature = _file_signature(self.manifest_path)
+
+    def segments(self) -> List[Dict[str, Any]]:
+        return list(self._manifest()["segments"])
+
+    def version(self) -> str:
+        """
+        Changes on every append, rotation and compaction (by any process).
+        """
+        signature = _file_signature(self.path)
+        live = f"{signature[0]}-{signature[1]}" if signature else "empty"
+        archived = _file_signature(self.manifest_path)
+        return f"{archived[0]}-{live}" if archived else live
+
+    # --- Rotation ---
+
+    def _month_of_live(self) -> Optional[str]:
+        """
+        Calendar month ("2025-07") of the live file's first entry, cached per file.
+        The key includes the archived byte count: a new live file after a
+        rotation (by any process) can reuse the old one's inode.
+        """
+        try:
+            key = (self.path.stat().st_ino, self._manifest()["base"])
+        except FileNotFoundError:
+            return None
+        if self._live_month is None or self._live_month[0] != key:
+            with open(self.path, "rb") as f:
+                first = _decode_lines(f.readline())
+            ts = entry_timestamp(first[0]) if first else None
+            self._live_month = (key, _month(ts) if ts is not None else None)
+        return self._live_month[1]
+
+    def rotate(self, force: bool = False, incoming: int = 0) -> bool:
+        """
+        Archives the live file if it is due (over `rotate_bytes` with `incoming`
+        more bytes, or started in an earlier month), or unconditionally with
+        `force`. Returns whether it rotated.
+        """
+        with self._lock:
+            self._prepare()
+            size = self.path.stat().st_size if self.path.exists() else 0
+            if size == 0:
+                return False
+            live_month = self._month_of_live()
+            due = size + incoming > self.rotate_bytes or (live_month is not None and live_month < _month(time.time()))
+            if not (due or force):
+                return False
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            raw_path = self.archive_dir / f"{self.path.stem}-{self._manifest()['next_seq']:05d}.jsonl"
+            # Atomic: appends from here on (any process) start a new live file
+            os.replace(self.path, raw_path)
+            self._live_month = None
+            self._archive(raw_path)
+            return True
+
+    def _archive(self, raw_path: Path) -> None:
+        """
+        Compresses a rotated live file into segments (one per calendar month it
+        spans, for chronological logs) and records them in the manifest.
+        """
+        raw = raw_path.read_bytes()
+        end = raw.rfind(b"\n") + 1
+        if end < len(raw):
+            raw = raw[:end]  # torn last record
+        manifest = copy.deepcopy(self._manifest())
+        for start, stop in _month_runs(raw):
+            chunk = raw[start:stop]
+            seq = manifest["next_seq"]
+            segment = _segment_info(f"{self.path.stem}-{seq:05d}.jsonl.gz", _decode_lines(chunk))
+            segment.update(offset=manifest["base"], length=len(chunk))
+            _write_gzip(self.archive_dir / segment["file"], chunk)
+            manifest["segments"].append(segment)
+            manifest["base"] += len(chunk)
+            manifest["next_seq"] = seq + 1
+        self._save_manifest(manifest)
+        raw_path.unlink()
+        print(f"Archived {len(raw)} bytes of {self.path.name} into {self.archive_dir.name}/")
+
+    def compact(self, before: float, summarize: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> int:
+        """
+        Replaces every archived segment whose entries all precede `before` with
+        `summarize(entries)`. Byte cursors past a compacted segment stay valid;
+        line cursors from `query` taken before the compaction do not.
+        Returns the number of segments compacted.
+        """
+        with self._lock:
+            self._prepare()
+            manifest = copy.deepcopy(self._manifest())
+            compacted = 0
+            for segment in manifest["segments"]:
+                if segment.get("compacted") or segment["last_ts"] is None or segment["last_ts"] >= before:
+                    continue
+                old_path = self.archive_dir / segment["file"]
+                summary = summarize(self._read_segment(segment))
+                segment["file"] = segment["file"].replace(".jsonl.gz", ".summary.jsonl.gz")
+                _write_gzip(self.archive_dir / segment["file"], _encode_lines(summary))
+                segment.update(entries=len(summary), compacted=True)
+                self._save_manifest(manifest)
+                old_path.unlink()
+                compacted += 1
+            return compacted
+
+    # --- Reads and writes ---
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.append_many([entry])
+
+    def append_many(self, entries: Iterable[Dict[str, Any]], fsync: Optional[bool] = None) -> None:
+        """
+        Appends all entries with a single write (and at most one fsync).
+        `fsync` overrides the log's default for this call.
+        """
+        data = _encode_lines(entries)
+        if not data:
+            return
+        with self._lock:
+            self._prepare()
+            self.rotate(incoming=len(data))
+            started = time.perf_counter()
+            with open(self.path, "ab") as f:
+                f.write(data)
+                if self.fsync if fsync is None else fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        metrics.store_bytes.inc(self.path.name, "write", amount=len(data))
+        metrics.store_duration.observe(time.perf_counter() - started, self.path.name, "write")
+
+    def _read_segment(self, segment: Dict[str, Any], skip: int = 0) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            with gzip.open(self.archive_dir / segment["file"], "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Replaced by a concurrent compaction; our manifest snapshot is stale
+            print(f"Archive segment {segment['file']} disappeared while reading")
+            return []
+        metrics.store_bytes.inc(f"{self.path.stem}.archive", "read", amount=len(data))
+        metrics.store_duration.observe(time.perf_counter() - started, f"{self.path.stem}.archive", "read")
+        return _decode_lines(data[skip:])
+
+    def _read_live(self, offset: int) -> Tuple[bytes, int]:
+        """
+        Complete lines of the live file after `offset` and the offset after them.
+        Stops before an incomplete last line (an append still in progress in
+        another process), so nothing is read twice or skipped.
+        """
+        if not self.path.exists():
+            return b"", 0
+        started = time.perf_counter()
+        with open(self.path, "rb") as f:
+            if offset > os.fstat(f.fileno()).st_size:
+                offset = 0  # file was replaced
+            f.seek(offset)
+            data = f.read()
+        if data:
+            metrics.store_bytes.inc(self.path.name, "read", amount=len(data))
+            metrics.store_duration.observe(time.perf_counter() - started, self.path.name, "read")
+        end = data.rfind(b"\n") + 1
+        return data[:end], offset + end
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        return self.read_from(0)[0]
+
+    def read_from(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Entries appended after byte `offset` (counted across archived segments
+        and the live file), and the offset to continue from.
+        """
+        with self._lock:
+            self._prepare()
+            # Manifest and live file must be read together: a rotation moves
+            # live bytes into the archive
+            manifest = self._manifest()
+            base = manifest["base"]
+            data, live_end = self._read_live(max(0, offset - base))
+        entries = []
+        if offset < base:
+            # Segments are immutable, so they are read outside the lock
+            for segment in manifest["segments"]:
+                skip = offset - segment["offset"]
+                if skip >= segment["length"] or (skip > 0 and segment.get("compacted")):
+                    continue
+                entries.extend(self._read_segment(segment, max(0, skip)))
+        entries.extend(_decode_lines(data))
+        return entries, base + live_end
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              category: Optional[str] = None, limit: Optional[int] = None,
+              cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Linear-scan equivalent of SqliteStore.query. The cursor is the line index
+        to resume after. Archived segments outside [since, until) or before the
+        cursor are skipped without being opened.
+        """
+        if limit is not None and limit <= 0:
+            return [], None
+        start = int(cursor) + 1 if cursor is not None else 0
+        with self._lock:
+            self._prepare()
+            manifest = self._manifest()
+            live, _ = self._read_live(0)
+
+        def sources() -> Iterator[Tuple[int, Optional[Callable[[], List[Dict[str, Any]]]]]]:
+            for segment in manifest["segments"]:
+                first, last = segment["first_ts"], segment["last_ts"]
+                if first is not None and ((since is not None and last < since) or (until is not None and first >= until)):
+                    yield segment["entries"], None
+                else:
+                    yield segment["entries"], lambda s=segment: self._read_segment(s)
+            live_entries = _decode_lines(live)
+            yield len(live_entries), lambda: live_entries
+
+        results = []
+        index = 0
+        for count, load in sources():
+            segment_start = index
+            index += count
+            if index <= start or load is None:
+                continue
+            for line_index, entry in enumerate(load(), segment_start):
+                if line_index < start:
+                    continue
+                if category is not None and entry_category(entry) != category:
+                    continue
+                if since is not None or until is not None:
+                    ts = entry_timestamp(entry)
+                    if ts is None or (since is not None and ts < since) or (until is not None and ts >= until):
+                        continue
+                if limit is not None and len(results) == limit:
+                    return results, str(last_index)
+                results.append(entry)
+                last_index = line_index
+        return results, None
+
+def _encode_lines(entries: Iterable[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+
+def _decode_lines(data: bytes) -> List[Dict[str, Any]]:
+    entries = []
+    for line in data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            # Partial record left behind by a crash mid-append
+            continue
+    return entries
+
+def _month(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m")
+
+def _month_runs(raw: bytes) -> List[Tuple[int, int]]:
+    """
+    Byte ranges of `raw` (complete lines) split wherever the entries' month
+    changes. Logs that aren't in time order give one range instead of hundreds.
+    """
+    runs: List[Tuple[int, int]] = []
+    start = position = 0
+    month = None
+    for line in raw.splitlines(keepends=True):
+        entries = _decode_lines(line)
+        ts = entry_timestamp(entries[0]) if entries else None
+        line_month = _month(ts) if ts is not None else month
+        if month is not None and line_month != month:
+            runs.append((start, position))
+            start = position
+        month = line_month
+        position += len(line)
+    if position > start:
+        runs.append((start, position))
+    return runs if len(runs) <= MAX_ROTATION_SEGMENTS else [(0, len(raw))]
+
+def _segment_info(file_name: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    timestamps = [ts for ts in map(entry_timestamp, entries) if ts is not None]
+    return {
+        "file": file_name,
+        "entries": len(entries),
+        "first_ts": min(timestamps) if timestamps else None,
+        "last_ts": max(timestamps) if timestamps else None,
+    }
+
+def _write_gzip(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(gzip.compress(data, mtime=0))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class DataStore:
+    """
+    Every data file of one workspace, under its own directory: config, task
+    cache and the history/pause/event logs (or kairos.db with
+    KAIROS_STORAGE=sqlite). Stores share nothing, not even locks, so
+    workspaces never contend with each other.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        data_dir.mkdir(parents=True, exist_ok=True)
+        self.sessions_file = data_dir / SESSIONS_FILE.name
+        self.logs = {
+            "history": JsonlLog(data_dir / HISTORY_LOG_FILE.name, legacy_path=data_dir / HISTORY_FILE.name),
+            "pause_log": JsonlLog(data_dir / PAUSE_LOG_LOG_FILE.name, legacy_path=data_dir / PAUSE_LOG_FILE.name),
+            "event_log": JsonlLog(data_dir / EVENT_LOG_LOG_FILE.name, legacy_path=data_dir / EVENT_LOG_FILE.name),
+        }
+        self.config_store = CachedJsonFile(data_dir / CONFIG_FILE.name, DEFAULT_CONFIG)
+        # Concurrent workers may each add entries; on flush ours win over the file's
+        self.task_cache_store = CachedJsonFile(data_dir / CACHE_FILE.name, {},
+                                               merge=lambda on_disk, ours: {**on_disk, **ours})
+        self.sqlite = None
+        if STORAGE_BACKEND == "sqlite":
+            from .sqlite_store import SqliteStore
+            self.sqlite = SqliteStore(
+                data_dir / SQLITE_FILE.name,
+                legacy_logs=self.logs,
+                legacy_cache_path=data_dir / CACHE_FILE.name
+            )
+
+    def flush_caches(self) -> None:
+        """
+        Writes any pending task-cache updates to disk. Called on shutdown.
+        """
+        self.task_cache_store.flush()
+
+    def load_config(self) -> Dict[str, Any]:
+        return self.config_store.get()
+
+    def save_config(self, data: Dict[str, Any]) -> None:
+        self.config_store.set(data)
+
+    def config_version(self) -> Optional[str]:
+        return self.config_store.version()
+
+    def history_version(self) -> str:
+        """
+        Changes whenever history is appended to (by any worker).
+        """
+        if self.sqlite:
+            return f"sqlite-{self.sqlite.version('history')}"
+        return self.logs["history"].version()
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        if self.sqlite:
+            return self.sqlite.read_all("history")
+        return self.logs["history"].read_all()
+
+    def query_history(self, since: Optional[float] = None, until: Optional[float] = None,
+                      category: Optional[str] = None, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns (entries, next_cursor). next_cursor is None on the last page.
+        """
+        if self.sqlite:
+            return self.sqlite.query("history", since, until, category, limit, cursor)
+        return self.logs["history"].query(since, until, category, limit, cursor)
+
+    def read_log_since(self, name: str, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Entries of a log ("history", "pause_log", "event_log") appended after `cursor`
+        (None = from the start), and the cursor to pass next time. Lets in-memory
+        aggregates follow appends from every worker process without rescanning the log.
+        """
+        if self.sqlite:
+            return self.sqlite.read_since(name, cursor or 0)
+        return self.logs[name].read_from(cursor or 0)
+
+    def read_history_since(self, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        return self.read_log_since("history", cursor)
+
+    def load_task_cache(self) -> Dict[str, Any]:
+        if self.sqlite:
+            return self.sqlite.load_task_cache()
+        return self.task_cache_store.get()
+
+    def save_task_cache(self, data: Dict[str, Any]) -> None:
+        if self.sqlite:
+            self.sqlite.save_task_cache(data)
+        else:
+            # Write-behind: flushed after a short debounce, or on shutdown
+            self.task_cache_store.set_deferred(data)
+
+    def append_log(self, name: str, entries: List[Dict[str, Any]], fsync: Optional[bool] = None) -> None:
+        if not entries:
+            return
+        if self.sqlite:
+            self.sqlite.append_many(name, entries)
+        else:
+            self.logs[name].append_many(entries, fsync=fsync)
+
+# The default workspace: the data files directly under BASE_DIR
+default_store = DataStore(BASE_DIR)
+
+def flush_caches() -> None:
+    default_store.flush_caches()
 
 def load_config() -> Dict[str, Any]:
-    return _load_json(CONFIG_FILE, DEFAULT_CONFIG)
+    return default_store.load_config()
 
 def save_config(data: Dict[str, Any]) -> None:
-    _save_json(CONFIG_FILE, data)
+    default_store.save_config(data)
+
+def config_version() -> Optional[str]:
+    return default_store.config_version()
+
+def history_version() -> str:
+    return default_store.history_version()
 
 def get_history() -> List[Dict[str, Any]]:
-    return _load_json(HISTORY_FILE, [])
+    return default_store.get_history()
+
+def query_history(since: Optional[float] = None, until: Optional[float] = None,
+                  category: Optional[str] = None, limit: Optional[int] = None,
+                  cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    return default_store.query_history(since, until, category, limit, cursor)
+
+def read_log_since(name: str, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    return default_store.read_log_since(name, cursor)
+
+def read_history_since(cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    return default_store.read_history_since(cursor)
 
 def append_history(entry: Dict[str, Any]) -> None:
-    history = get_history()
-    history.append(entry)
-    _save_json(HISTORY_FILE, history)
+    append_history_many([entry])
+
+def append_history_many(entries: List[Dict[str, Any]], fsync: Optional[bool] = None) -> None:
+    default_store.append_log("history", entries, fsync)
 
-def load_task_cache() -> Dict[str, str]:
-    return _load_json(CACHE_FILE, {})
+def load_task_cache() -> Dict[str, Any]:
+    return default_store.load_task_cache()
 
-def save_task_cache(data: Dict[str, str]) -> None:
-    _save_json(CACHE_FILE, data)
+def save_task_cache(data: Dict[str, Any]) -> None:
+    default_store.save_task_cache(data)
 
 def append_pause_log(entry: Dict[str, Any]) -> None:
-    logs = _load_json(PAUSE_LOG_FILE, [])
-    logs.append(entry)
-    _save_json(PAUSE_LOG_FILE, logs)
+    append_pause_log_many([entry])
+
+def append_pause_log_many(entries: List[Dict[str, Any]], fsync: Optional[bool] = None) -> None:
+    default_store.append_log("pause_log", entries, fsync)
 
 def append_event_log(entry: Dict[str, Any]) -> None:
-    logs = _load_json(EVENT_LOG_FILE, [])
-    logs.append(entry)
-    _save_json(EVENT_LOG_FILE, logs)
+    append_event_log_many([entry])
+
+def append_event_log_many(entries: List[Dict[str, Any]], fsync: Optional[bool] = None) -> None:
+    default_store.append_log("event_log", entries, fsync)
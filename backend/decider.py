@@ -0,0 +1,120 @@
+import random
+from typing import Dict, List, Any, Optional
+
+class FenwickTree:
+    """
+    Binary indexed tree over non-negative weights: O(log n) point updates and
+    O(log n) sampling proportional to weight.
+    """
+
+    def __init__(self, weights: List[float]):
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.tree = [0.0] * (self.size + 1)
+        # O(n) construction
+        for i, w in enumerate(weights, start=1):
+            self.tree[i] += w
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def set(self, index: int, weight: float) -> None:
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def total(self) -> float:
+        total = 0.0
+        i = self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value: float) -> int:
+        """
+        Smallest index whose prefix sum exceeds `value` (0 <= value < total()).
+        """
+        pos = 0
+        remaining = value
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self.tree[nxt]
+            step >>= 1
+        # Guard against float drift running past the last positive weight
+        pos = min(pos, self.size - 1)
+        while pos > 0 and self.weights[pos] <= 0:
+            pos -= 1
+        return pos
+
+def task_sort_key(task: Dict[str, Any]):
+    # Todoist priority 4 is the most urgent; undated tasks go last
+    return (-(task.get("priority") or 1), task.get("due_date") or "9999-99-99")
+
+class TaskDecider:
+    """
+    Weighted random category/task pick over one snapshot of categorized tasks.
+    Built once per snapshot; completing a task or changing category weights is
+    an O(log categories) update instead of a rebuild.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]], weights: Dict[str, float]):
+        self.categories = list(weights.keys())
+        self._index = {name: i for i, name in enumerate(self.categories)}
+        self.base_weights = dict(weights)
+        self.tasks_by_category: Dict[str, List[Dict[str, Any]]] = {name: [] for name in self.categories}
+        self.task_category: Dict[str, str] = {}
+
+        for task in tasks:
+            category = task.get("category")
+            if category in self.tasks_by_category:
+                self.tasks_by_category[category].append(task)
+                self.task_category[str(task["id"])] = category
+        for bucket in self.tasks_by_category.values():
+            bucket.sort(key=task_sort_key)
+
+        self.tree = FenwickTree([self._effective_weight(name) for name in self.categories])
+
+    def _effective_weight(self, category: str) -> float:
+        if not self.tasks_by_category[category]:
+            return 0.0
+        return max(0.0, self.base_weights.get(category, 0.0))
+
+    def update_weights(self, weights: Dict[str, float]) -> None:
+        for name, weight in weights.items():
+            if name in self._index and weight != self.base_weights.get(name):
+                self.base_weights[name] = weight
+                self.tree.set(self._index[name], self._effective_weight(name))
+
+    def complete(self, task_id: str) -> None:
+        category = self.task_category.pop(str(task_id), None)
+        if category is None:
+            return
+        bucket = self.tasks_by_category[category]
+        bucket[:] = [t for t in bucket if str(t["id"]) != str(task_id)]
+        if not bucket:
+            self.tree.set(self._index[category], 0.0)
+
+    def pick(self, rng: random.Random) -> Optional[Dict[str, Any]]:
+        total = self.tree.total()
+        if total > 0:
+            category = self.categories[self.tree.find(rng.random() * total)]
+        else:
+            # Every goal is met (or weights are zero): fall back to a uniform pick
+            non_empty = [name for name in self.categories if self.tasks_by_category[name]]
+            if not non_empty:
+                return None
+            category = rng.choice(non_empty)
+
+        bucket = self.tasks_by_category[category]
+        return {
+            "category": category,
+            "task": bucket[0],
+            "related_tasks": bucket[1:],
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import secrets
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+class EventBroker:
+    """
+    Fans session events out to every open push connection.
+    Publishing is one put per subscriber queue, so idle clients cost nothing, and
+    recent events are kept in a ring buffer so a reconnecting client can resume
+    from its Last-Event-ID.
+    Ids sent to clients carry a per-broker epoch ("<epoch>-<n>"): after a
+    restart, or on another worker, a client's id is recognised as foreign
+    instead of being mistaken for one of our own.
+    """
+
+    def __init__(self, buffer_size: int = 256, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.epoch = secrets.token_hex(4)
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._next_id = 1
+
+    @property
+    def last_event_id(self) -> int:
+        return self._next_id - 1
+
+    def format_id(self, event_id: int) -> str:
+        return f"{self.epoch}-{event_id}"
+
+    def parse_id(self, value: Optional[str]) -> Optional[int]:
+        """
+        Our event number for a client's Last-Event-ID; None if it's missing,
+        malformed or from another epoch.
+        """
+        epoch, _, number = (value or "").partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        event_id = self._next_id
+        self._next_id += 1
+        event = (event_id, event_type, {**data, "server_time": time.time()})
+        self._buffer.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: drop it; it will reconnect and resume from its last id
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return event_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Tuple[asyncio.Queue, Optional[List[Event]]]:
+        """
+        Returns (queue, backlog). The backlog holds the buffered events after
+        `last_event_id`, or is None if those events are no longer buffered (the
+        client must then resync from a full state snapshot).
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+
+        backlog: Optional[List[Event]] = []
+        if last_event_id is not None and last_event_id > self.last_event_id:
+            backlog = None  # an id we never issued
+        elif last_event_id is not None and last_event_id < self.last_event_id:
+            oldest = self._buffer[0][0] if self._buffer else self._next_id
+            if last_event_id + 1 < oldest:
+                backlog = None
+            else:
+                backlog = [e for e in self._buffer if e[0] > last_event_id]
+        return queue, backlog
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def close(self) -> None:
+        """
+        Ends every open stream (used on shutdown).
+        """
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+        self._subscribers.clear()
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+def format_sse(event_type: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
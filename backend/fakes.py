@@ -0,0 +1,220 @@
+"""
+Offline stand-ins for external services, for tests and benchmarks.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional
+
+from .todoist_client import SyncTokenInvalid
+
+class FakeSyncTransport:
+    """
+    In-memory Todoist Sync API. Every change bumps a revision; a sync token is the
+    revision the client last saw, so each call returns exactly the items changed
+    since then.
+    """
+
+    def __init__(self, tasks: Optional[List[Dict[str, Any]]] = None):
+        self.revision = 0
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.changed_at: Dict[str, int] = {}
+        self.valid_from = 0
+        self.calls: List[str] = []
+        for task in tasks or []:
+            self.add_task(task["id"], task["content"], task.get("priority", 1), task.get("due"))
+
+    def _touch(self, task_id: str) -> None:
+        self.revision += 1
+        self.changed_at[task_id] = self.revision
+
+    def add_task(self, task_id: str, content: str, priority: int = 1, due: Optional[Dict[str, Any]] = None) -> None:
+        self.items[task_id] = {"id": task_id, "content": content, "priority": priority, "due": due,
+                               "checked": False, "is_deleted": False}
+        self._touch(task_id)
+
+    def rename_task(self, task_id: str, content: str) -> None:
+        self.items[task_id]["content"] = content
+        self._touch(task_id)
+
+    def complete_task(self, task_id: str) -> None:
+        self.items[task_id]["checked"] = True
+        self._touch(task_id)
+
+    def delete_task(self, task_id: str) -> None:
+        self.items[task_id]["is_deleted"] = True
+        self._touch(task_id)
+
+    def invalidate_tokens(self) -> None:
+        """
+        Rejects every token issued so far, forcing the client back to a full sync.
+        """
+        self.valid_from = self.revision + 1
+
+    async def __call__(self, sync_token: str) -> Dict[str, Any]:
+        self.calls.append(sync_token)
+        if sync_token == "*":
+            items = [dict(i) for i in self.items.values() if not i["checked"] and not i["is_deleted"]]
+            return {"sync_token": str(self.revision), "full_sync": True, "items": items}
+
+        since = int(sync_token)
+        if since < self.valid_from:
+            raise SyncTokenInvalid(f"Sync token {sync_token} is no longer valid")
+        items = [dict(self.items[i]) for i, rev in self.changed_at.items() if rev > since]
+        return {"sync_token": str(self.revision), "full_sync": False, "items": items}
+
+@dataclass
+class FakeDue:
+    string: str
+    date: str
+
+@dataclass
+class FakeTask:
+    id: str
+    content: str
+    priority: int = 1
+    due: Optional[FakeDue] = None
+
+def make_tasks(count: int, categories: List[str], seed: Optional[int] = None) -> List[FakeTask]:
+    """
+    Synthetic tasks; about half mention a category name so FakeGemma's keyword
+    classifier has something to find.
+    """
+    rng = random.Random(seed)
+    verbs = ["Write", "Review", "Plan", "Fix", "Call", "Read", "Clean", "Book", "Prepare", "Email"]
+    nouns = ["report", "slides", "budget", "garden", "dentist", "notes", "invoice", "trip", "chapter", "draft"]
+    tasks = []
+    for i in range(count):
+        title = f"{rng.choice(verbs)} {rng.choice(nouns)} {i}"
+        if categories and rng.random() < 0.5:
+            title += f" for {rng.choice(categories)}"
+        due = FakeDue("tomorrow", f"2026-01-{rng.randint(1, 28):02d}") if rng.random() < 0.3 else None
+        tasks.append(FakeTask(str(1000 + i), title, rng.randint(1, 4), due))
+    return tasks
+
+class FakeTodoistAPI:
+    """
+    Stand-in for TodoistAPIAsync (get_tasks/close_task) with configurable latency
+    and failure rate. `churn` renames that fraction of tasks on every get_tasks
+    call, so each refresh has new titles to categorize.
+    """
+
+    def __init__(self, tasks: Optional[List[FakeTask]] = None, latency: float = 0.0,
+                 failure_rate: float = 0.0, churn: float = 0.0, page_size: int = 200,
+                 seed: Optional[int] = None):
+        self.tasks: Dict[str, FakeTask] = {t.id: t for t in tasks or []}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.churn = churn
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def _call(self) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise RuntimeError("FakeTodoistAPI injected failure")
+
+    async def get_tasks(self) -> AsyncIterator[List[FakeTask]]:
+        await self._call()
+        if self.churn and self.tasks:
+            for task in self.rng.sample(list(self.tasks.values()), max(1, int(len(self.tasks) * self.churn))):
+                task.content = f"{task.content.split(' #')[0]} #{self.calls}"
+        tasks = list(self.tasks.values())
+
+        async def pages():
+            for start in range(0, len(tasks), self.page_size):
+                yield tasks[start:start + self.page_size]
+        return pages()
+
+    async def close_task(self, task_id: str) -> bool:
+        await self._call()
+        return self.tasks.pop(task_id, None) is not None
+
+class FakeGenaiClient:
+    """
+    Stand-in for genai.Client: `client.aio.models.generate_content` answers with
+    the given model (a FakeGemma by default). Assign it to gemini_client._client
+    to exercise the real gemma_generate path offline.
+    """
+
+    class _Response:
+        def __init__(self, text: str):
+            self.text = text
+
+    def __init__(self, model: Optional["FakeGemma"] = None):
+        self.model = model or FakeGemma()
+        self.aio = self
+        self.models = self
+
+    async def generate_content(self, model: str, contents: str) -> "FakeGenaiClient._Response":
+        return self._Response(await self.model(contents))
+
+class FakeServerError(RuntimeError):
+    """
+    Transient model failure, like the SDK's APIError for a 503.
+    """
+    code = 503
+
+class FakeGemma:
+    """
+    Local stand-in for the Gemma model, usable as a CategorizationService `model`.
+    Answers the batch and single-task prompts built by gemini_client, with
+    configurable latency and failure rate. `classify` maps (title, categories)
+    to a category; by default it picks the first category whose name appears in
+    the title, else "Uncategorized".
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0,
+                 classify: Optional[Callable[[str, List[str]], str]] = None,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.classify = classify or _keyword_classify
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.prompts: List[str] = []
+
+    async def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompts.append(prompt)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise FakeServerError("FakeGemma injected failure")
+
+        category_match = re.search(r"categories: \[(.*?)\]", prompt)
+        categories = category_match.group(1).split(", ") if category_match and category_match.group(1) else []
+
+        tasks_match = re.search(r"^Tasks: (.*)$", prompt, re.MULTILINE)
+        if tasks_match:
+            titles = json.loads(tasks_match.group(1))
+            return json.dumps({t: self.classify(t, categories) for t in titles})
+
+        title_match = re.search(r"Classify the task '(.*)' into", prompt)
+        return self.classify(title_match.group(1) if title_match else "", categories)
+
+def _keyword_classify(title: str, categories: List[str]) -> str:
+    lowered = title.lower()
+    for category in categories:
+        if category.lower() in lowered:
+            return category
+    return "Uncategorized"
+
+class RecordingNotifier:
+    """
+    Notifier that records messages (with their time) instead of showing toasts.
+    """
+
+    def __init__(self):
+        self.messages: List[str] = []
+        self.times: List[float] = []
+
+    def notify(self, message: str) -> None:
+        self.messages.append(message)
+        self.times.append(time.time())
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
+
+from .database import CachedJsonFile, DataStore, default_store, entry_category, entry_minutes, entry_task_name
+from .locks import FileLock
+
+# Both live in the workspace's data directory
+CONTEXT_FILE_NAME = "context.md"
+FREE_TIME_FILE_NAME = "free_time.json"
+
+# Ideas are regenerated (if their inputs changed) once a week
+REGENERATE_INTERVAL = 7 * 86400
+# Activity window the ideas are based on
+HISTORY_WINDOW_DAYS = 14
+TOP_TASKS = 10
+IDEA_COUNT = 3
+# context.md sections shorter than this go into the prompt verbatim
+SUMMARY_MIN_CHARS = 600
+# Background loop wake-up, to notice a due regeneration after sleep/hibernate
+CHECK_INTERVAL = 3600.0
+
+ModelFn = Callable[[str], Awaitable[str]]
+
+_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+def split_sections(text: str) -> List[str]:
+    """
+    Splits markdown into sections at headings (text before the first heading is
+    its own section). Empty sections are dropped.
+    """
+    starts = [m.start() for m in _HEADING.finditer(text)]
+    bounds = ([0] if not starts or starts[0] > 0 else []) + starts + [len(text)]
+    sections = [text[a:b].strip() for a, b in zip(bounds, bounds[1:])]
+    return [s for s in sections if s]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def build_summary_prompt(section: str) -> str:
+    return (
+        "Summarize this section of someone's personal project notes in at most 3 sentences. "
+        "Keep concrete project names, tools and goals.\n\n"
+        f"{section}"
+    )
+
+def build_ideas_prompt(context: List[str], activity: Dict[str, Any], previous: List[str]) -> str:
+    notes = "\n".join(f"- {chunk}" for chunk in context) or "- (no notes)"
+    avoid = f"Do not repeat these earlier ideas: {json.dumps(previous, ensure_ascii=False)}\n" if previous else ""
+    return (
+        f"You suggest small build projects for someone's free time.\n"
+        f"Their project notes:\n{notes}\n"
+        f"Their last {HISTORY_WINDOW_DAYS} days (hours per category, most worked-on tasks): "
+        f"{json.dumps(activity, ensure_ascii=False)}\n"
+        f"{avoid}"
+        f"Suggest exactly {IDEA_COUNT} fresh, concrete ideas that build on the notes and fit the recent activity.\n"
+        f"Return ONLY a JSON array of objects with \"title\" and \"description\" (one or two sentences)."
+    )
+
+def parse_ideas(text: str) -> List[Dict[str, str]]:
+    """
+    Best-effort parse of the model's JSON array; ideas without a title are dropped.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(parsed, list):
+        return []
+    ideas = []
+    for item in parsed:
+        if isinstance(item, dict) and isinstance(item.get("title"), str) and item["title"].strip():
+            ideas.append({"title": item["title"].strip(), "description": str(item.get("description") or "").strip()})
+    return ideas[:IDEA_COUNT]
+
+def recent_activity(data: DataStore, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Hours per category and the most worked-on tasks over the history window,
+    rounded so small day-to-day changes don't count as new input.
+    """
+    now = now or time.time()
+    entries, _ = data.query_history(since=now - HISTORY_WINDOW_DAYS * 86400)
+    hours: Dict[str, float] = {}
+    task_minutes: Dict[str, float] = {}
+    for entry in entries:
+        minutes = entry_minutes(entry)
+        category = entry_category(entry) or "Uncategorized"
+        hours[category] = hours.get(category, 0.0) + minutes / 60
+        name = entry_task_name(entry)
+        if name:
+            task_minutes[name] = task_minutes.get(name, 0.0) + minutes
+    top_tasks = sorted(task_minutes, key=lambda name: (-task_minutes[name], name))[:TOP_TASKS]
+    return {
+        "hours_by_category": {c: round(h) for c, h in sorted(hours.items()) if round(h)},
+        "top_tasks": top_tasks,
+    }
+
+class FreeTimeEngine:
+    """
+    Free-time build ideas from context.md and recent history, generated in the
+    background and served from the workspace's free_time.json.
+    Inputs are content-hashed: each context.md section is summarized once and
+    the summary kept under the section's hash, so an edit re-sends only the
+    changed sections, and the weekly regeneration skips the ideas call
+    entirely when neither the notes nor the activity changed.
+    """
+
+    def __init__(self, model: ModelFn, data: DataStore = default_store,
+                 interval: float = REGENERATE_INTERVAL):
+        self.model = model
+        self.data = data
+        self.context_file = data.data_dir / CONTEXT_FILE_NAME
+        self.store = CachedJsonFile(data.data_dir / FREE_TIME_FILE_NAME, {"ideas": [], "summaries": {}})
+        self.interval = interval
+        self._lock = FileLock(data.data_dir / "free_time.generate.lock")
+        self._inflight: Optional[asyncio.Task] = None
+
+    def state(self) -> Dict[str, Any]:
+        """
+        The cached ideas; never waits on the model.
+        """
+        data = self.store.get()
+        generated_at = data.get("generated_at")
+        return {
+            "ideas": data.get("ideas", []),
+            "generated_at": generated_at,
+            "stale": generated_at is None or time.time() - generated_at > self.interval,
+            "generating": self._inflight is not None and not self._inflight.done(),
+        }
+
+    def offer(self, rng: random.Random, chance: float) -> Optional[List[Dict[str, str]]]:
+        """
+        The cached ideas with probability `chance`, else None. Also None while
+        there are no ideas yet, so a pick never comes back empty-handed.
+        """
+        ideas = self.store.get().get("ideas")
+        if not ideas or rng.random() >= chance:
+            return None
+        return ideas
+
+    def is_due(self) -> bool:
+        checked_at = self.store.get().get("checked_at")
+        return checked_at is None or time.time() - checked_at >= self.interval
+
+    async def _context_chunks(self, sections: List[str], summaries: Dict[str, str]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Prompt chunks for the sections, in order, and the summaries to keep.
+        Only sections with no stored summary go to the model.
+        """
+        kept: Dict[str, str] = {}
+        missing = []
+        for section in sections:
+            if len(section) < SUMMARY_MIN_CHARS:
+                continue
+            key = content_hash(section)
+            if key in summaries:
+                kept[key] = summaries[key]
+            else:
+                missing.append((key, section))
+
+        if missing:
+            print(f"Summarizing {len(missing)} changed context.md sections")
+            results = await asyncio.gather(*(self.model(build_summary_prompt(s)) for _, s in missing),
+                                           return_exceptions=True)
+            for (key, _), result in zip(missing, results):
+                if isinstance(result, Exception):
+                    print(f"Error summarizing context section: {type(result).__name__}: {result}")
+                elif result.strip():
+                    kept[key] = " ".join(result.split())
+
+        chunks = []
+        for section in sections:
+            if len(section) < SUMMARY_MIN_CHARS:
+                chunks.append(" ".join(section.split()))
+            elif content_hash(section) in kept:
+                chunks.append(kept[content_hash(section)])
+        return chunks, kept
+
+    async def regenerate(self, force: bool = False) -> bool:
+        """
+        Regenerates the ideas if context.md or the activity window changed (or
+        `force`). Returns whether new ideas were stored. Only one
+        worker process regenerates at a time; the others skip.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            data = dict(self.store.get())
+            text = self.context_file.read_text(encoding="utf-8") if self.context_file.exists() else ""
+            sections = split_sections(text)
+            activity = await asyncio.to_thread(recent_activity, self.data)
+            input_hash = content_hash(json.dumps([[content_hash(s) for s in sections], activity], sort_keys=True))
+
+            if not force and data.get("ideas") and data.get("input_hash") == input_hash:
+                data["checked_at"] = time.time()
+                self.store.set(data)
+                print("Free-time inputs unchanged; keeping the cached ideas.")
+                return False
+
+            chunks, summaries = await self._context_chunks(sections, data.get("summaries", {}))
+            previous = [idea["title"] for idea in data.get("ideas", [])]
+            try:
+                ideas = parse_ideas(await self.model(build_ideas_prompt(chunks, activity, previous)))
+            except Exception as e:
+                print(f"Error generating free-time ideas: {type(e).__name__}: {e}")
+                ideas = []
+
+            # Keep the summaries either way, so a retry doesn't redo them
+            data["summaries"] = summaries
+            if ideas:
+                now = time.time()
+                data.update(ideas=ideas, input_hash=input_hash, generated_at=now, checked_at=now)
+            else:
+                print("No usable free-time ideas from the model; keeping the previous ones.")
+            self.store.set(data)
+            return bool(ideas)
+        finally:
+            self._lock.release()
+
+    def trigger(self, force: bool = False) -> None:
+        """
+        Starts a background regeneration unless one is already running.
+        """
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self.regenerate(force))
+            self._inflight.add_done_callback(_log_regenerate_error)
+
+    async def run(self) -> None:
+        """
+        Background scheduler: regenerates when due (at startup if there are no
+        ideas yet), then checks again every CHECK_INTERVAL seconds.
+        """
+        while True:
+            if self.is_due() or not self.store.get().get("ideas"):
+                self.trigger()
+                try:
+                    await asyncio.shield(self._inflight)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass  # already logged; keep serving the previous ideas
+            await asyncio.sleep(CHECK_INTERVAL)
+
+def _log_regenerate_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Free-time regeneration failed: {type(task.exception()).__name__}: {task.exception()}")
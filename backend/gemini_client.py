@@ -1,109 +1,467 @@
 import os
-from typing import List, Dict, Optional
-from google import genai
-from .database import load_task_cache, save_task_cache
+import re
+import json
+import random
+import zlib
+import asyncio
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, List, Dict, Optional, Set, Tuple
+import numpy as np
+from .task_cache import SOURCE_LLM, SOURCE_LOCAL, TaskCategoryCache, get_task_category_cache
+from . import metrics, tracing
 
-def categorize_task(task_title: str, categories: List[str], cache: Optional[Dict[str, str]] = None) -> str:
+MODEL_NAME = "gemma-3-4b-it"
+
+# Rough prompt budget per batch call. Titles are counted twice because the model
+# echoes each one back as a JSON key.
+MAX_PROMPT_TOKENS = 2000
+MAX_TITLES_PER_CHUNK = 50
+
+if TYPE_CHECKING:
+    from google import genai
+
+ModelFn = Callable[[str], Awaitable[str]]
+
+_client: Optional["genai.Client"] = None
+_warned_missing_key = False
+
+class ModelNotConfigured(RuntimeError):
+    """
+    No GEMINI_API_KEY: fails the same way on every attempt, so it isn't retried.
+    """
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Timeouts, dropped connections, 429 and 5xx responses. Configuration errors
+    and other 4xx responses (the SDK's APIError carries the HTTP `code`) would
+    only fail again.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+def get_client() -> Optional["genai.Client"]:
+    """
+    One pooled client for the whole process (it keeps its HTTP connections open).
+    The SDK is imported on first use; it is the slowest import in the backend.
+    """
+    global _client, _warned_missing_key
+    if _client is None:
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            if not _warned_missing_key:
+                print("Warning: GEMINI_API_KEY not found.")
+                _warned_missing_key = True
+            return None
+        from google import genai
+        _client = genai.Client(api_key=api_key)
+    return _client
+
+async def gemma_generate(prompt: str) -> str:
+    client = get_client()
+    if client is None:
+        raise ModelNotConfigured("GEMINI_API_KEY not configured")
+    response = await client.aio.models.generate_content(model=MODEL_NAME, contents=prompt)
+    return response.text or ""
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def build_single_prompt(task_title: str, categories: List[str]) -> str:
+    category_list_str = ", ".join(categories)
+    return f"Classify the task '{task_title}' into exactly one of these categories: [{category_list_str}]. Return ONLY the category name. If unsure or none match, return 'Uncategorized'."
+
+def build_batch_prompt(tasks: List[str], categories: List[str]) -> str:
+    category_list_str = ", ".join(categories)
+    # Construct a clear JSON instruction prompt
+    return (
+        f"You are a task management assistant. Classify the following tasks into exactly one of these categories: [{category_list_str}].\n"
+        f"Tasks: {json.dumps(tasks, ensure_ascii=False)}\n"
+        f"Return ONLY a valid JSON object where keys are the task titles and values are the assigned categories.\n"
+        f"If a task does not fit well, pick the best match or 'Uncategorized'.\n"
+        f"JSON Format Example: {{ \"Buy milk\": \"Personal\", \"Finish code\": \"Work\" }}"
+    )
+
+# A complete "key": "value" pair inside a possibly broken JSON object
+_PAIR_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def parse_batch_response(text: str) -> Dict[str, str]:
+    """
+    Best-effort parse of the model's JSON object. Tolerates code fences and
+    surrounding chatter, and if the object as a whole is malformed (e.g. truncated),
+    salvages every complete "title": "category" pair it can find.
+    """
+    cleaned_text = text.strip()
+    # Remove markdown code blocks if present
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text[7:]
+    if cleaned_text.startswith("```"):
+        cleaned_text = cleaned_text[3:]
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-3]
+
+    start, end = cleaned_text.find("{"), cleaned_text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            parsed = json.loads(cleaned_text[start:end + 1])
+            if isinstance(parsed, dict):
+                return {k: v for k, v in parsed.items() if isinstance(k, str) and isinstance(v, str)}
+        except json.JSONDecodeError:
+            pass
+
+    pairs = {}
+    for match in _PAIR_PATTERN.finditer(cleaned_text):
+        try:
+            pairs[json.loads(f'"{match.group(1)}"')] = json.loads(f'"{match.group(2)}"')
+        except json.JSONDecodeError:
+            continue
+    return pairs
+
+def _normalize_label(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+def validate_batch_result(raw: Dict[str, str], tasks: List[str], categories: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Checks a parsed model response against the titles we sent and the allowed
+    category names. Returns (valid, missing): valid maps the original titles to
+    canonical category names; missing lists titles that were omitted or given an
+    unknown category.
+    """
+    allowed = {_normalize_label(c): c for c in categories}
+    allowed[_normalize_label("Uncategorized")] = "Uncategorized"
+    titles = {_normalize_label(t): t for t in tasks}
+
+    valid: Dict[str, str] = {}
+    for key, value in raw.items():
+        title = key if key in tasks else titles.get(_normalize_label(key))
+        category = allowed.get(_normalize_label(value.strip().strip(".'\"")))
+        if title is not None and category is not None:
+            valid[title] = category
+
+    missing = [t for t in tasks if t not in valid]
+    return valid, missing
+
+# Hashed character n-gram features for the local classifier
+N_FEATURES = 2 ** 14
+NGRAM_SIZES = (2, 3, 4)
+
+def hash_ngrams(title: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Feature indices (with repeats) of the title's character 2-4-grams. crc32 keeps
+    the hashing stable across processes, unlike hash().
+    """
+    text = f" {' '.join(title.casefold().split())} "
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % n_features for g in grams), dtype=np.int64, count=len(grams))
+
+class LocalClassifier:
     """
-    Categorizes a task into one of the provided categories using Gemma 3 API via google-genai SDK.
-    Checks cache first.
-    """
-    # 1. Check Cache
-    use_external_cache = cache is not None
-    if not use_external_cache:
-        cache = load_task_cache()
-    
-    if task_title in cache:
-        return cache[task_title]
-    
-    # 2. Call Gemma 3 API
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("Warning: GEMINI_API_KEY not found.")
-        return "Uncategorized"
-
-    try:
-        client = genai.Client(api_key=api_key)
-        
-        category_list_str = ", ".join(categories)
-        prompt = f"Classify the task '{task_title}' into exactly one of these categories: [{category_list_str}]. Return ONLY the category name. If unsure or none match, return 'Uncategorized'."
-        
-        # Using 'gemma-2-9b-it' or 'gemini-1.5-flash' if 3 is not out yet, but user asked for 'gemma-3-12b'
-        # Current google-genai SDK maps models. 
-        # Attempting user's requested model string.
-        response = client.models.generate_content(
-            model="gemma-3-4b-it", 
-            contents=prompt
-        )
-        
-        if response.text:
-            category = response.text.strip()
-            # Basic cleanup
-            category = category.replace("```", "").replace("\n", "").strip()
+    Multinomial naive Bayes over hashed character n-grams, trained incrementally on
+    the title -> category pairs in the task cache. Confident predictions skip the
+    LLM entirely; the rest are passed on to Gemma.
+    """
+
+    def __init__(self, n_features: int = N_FEATURES, alpha: float = 0.1,
+                 threshold: float = 0.95, min_coverage: float = 0.6, min_examples: int = 20):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.min_examples = min_examples
+        self.classes: List[str] = []
+        self.feature_counts = np.zeros((0, n_features), dtype=np.float32)
+        self.class_counts = np.zeros(0, dtype=np.float64)
+        self.trained_titles: Set[str] = set()
+        self._log_prior: Optional[np.ndarray] = None
+        self._log_likelihood: Optional[np.ndarray] = None
+        self._seen_features: Optional[np.ndarray] = None
+        self.local_hits = 0
+        self.llm_fallbacks = 0
+
+    def _class_index(self, category: str) -> int:
+        if category not in self.classes:
+            self.classes.append(category)
+            self.feature_counts = np.vstack([self.feature_counts, np.zeros((1, self.n_features), dtype=np.float32)])
+            self.class_counts = np.append(self.class_counts, 0.0)
+        return self.classes.index(category)
+
+    def partial_fit(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Adds title/category pairs not seen before. Returns how many were added.
+        """
+        added = 0
+        for title, category in pairs:
+            if not isinstance(category, str) or category == "Uncategorized" or title in self.trained_titles:
+                continue
+            c = self._class_index(category)
+            np.add.at(self.feature_counts[c], hash_ngrams(title, self.n_features), 1.0)
+            self.class_counts[c] += 1
+            self.trained_titles.add(title)
+            added += 1
+        if added:
+            self._log_prior = None
+        return added
+
+    def _ensure_model(self) -> None:
+        if self._log_prior is None:
+            self._log_prior = np.log(self.class_counts / self.class_counts.sum())
+            smoothed = self.feature_counts + self.alpha
+            self._log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+            self._seen_features = self.feature_counts.sum(axis=0) > 0
+
+    def predict(self, titles: List[str], categories: List[str]) -> List[Tuple[str, float, float]]:
+        """
+        (category, posterior, coverage) per title, restricted to the allowed
+        categories. Coverage is the share of the title's n-grams seen in training;
+        naive Bayes posteriors are overconfident on unfamiliar titles, so both count.
+        """
+        allowed = np.array([c in categories for c in self.classes], dtype=bool)
+        if not titles or not allowed.any():
+            return [("Uncategorized", 0.0, 0.0) for _ in titles]
+        self._ensure_model()
+
+        # Sparse gather: each title only touches the columns of its own n-grams
+        scores = np.empty((len(titles), len(self.classes)), dtype=np.float64)
+        coverage = np.empty(len(titles), dtype=np.float64)
+        for row, title in enumerate(titles):
+            features = hash_ngrams(title, self.n_features)
+            scores[row] = self._log_likelihood[:, features].sum(axis=1)
+            coverage[row] = self._seen_features[features].mean() if len(features) else 0.0
+
+        scores += self._log_prior
+        scores[:, ~allowed] = -np.inf
+        scores -= scores.max(axis=1, keepdims=True)
+        posteriors = np.exp(scores)
+        posteriors /= posteriors.sum(axis=1, keepdims=True)
+        best = posteriors.argmax(axis=1)
+        return [(self.classes[b], float(posteriors[row, b]), float(coverage[row])) for row, b in enumerate(best)]
+
+    def classify(self, titles: List[str], categories: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Returns (resolved, unresolved): titles answered locally with confidence, and
+        the ones that still need the LLM.
+        """
+        if self.class_counts.sum() < self.min_examples:
+            self.llm_fallbacks += len(titles)
+            return {}, list(titles)
+
+        resolved: Dict[str, str] = {}
+        unresolved: List[str] = []
+        for title, (category, confidence, coverage) in zip(titles, self.predict(titles, categories)):
+            if confidence >= self.threshold and coverage >= self.min_coverage:
+                resolved[title] = category
+            else:
+                unresolved.append(title)
+        self.local_hits += len(resolved)
+        self.llm_fallbacks += len(unresolved)
+        return resolved, unresolved
+
+    def stats(self) -> Dict[str, float]:
+        total = self.local_hits + self.llm_fallbacks
+        return {
+            "examples": len(self.trained_titles),
+            "classes": len(self.classes),
+            "local_hits": self.local_hits,
+            "llm_fallbacks": self.llm_fallbacks,
+            "local_fraction": self.local_hits / total if total else 0.0,
+        }
+
+class CategorizationService:
+    """
+    Async task categorization. Cache misses first go through the optional local
+    classifier; the ones it isn't confident about are split into chunks that fit the
+    prompt budget, and chunks are sent concurrently (bounded) through one pooled
+    client, each with a timeout and retries with exponential backoff.
+    `model` can be swapped for a local fake in tests and benchmarks.
+    `task_cache` returns the title cache the local classifier trains on and
+    `categorize` reads through (the workspace's own).
+    """
+
+    def __init__(self, model: ModelFn = gemma_generate,
+                 max_concurrency: int = 4,
+                 chunk_timeout: float = 30.0,
+                 max_retries: int = 2,
+                 backoff_base: float = 1.0,
+                 max_prompt_tokens: int = MAX_PROMPT_TOKENS,
+                 max_titles_per_chunk: int = MAX_TITLES_PER_CHUNK,
+                 max_followups: int = 1,
+                 local_classifier: Optional[LocalClassifier] = None,
+                 task_cache: Callable[[], TaskCategoryCache] = get_task_category_cache):
+        self.model = model
+        self.task_cache = task_cache
+        self.max_concurrency = max_concurrency
+        self.chunk_timeout = chunk_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_titles_per_chunk = max_titles_per_chunk
+        self.max_followups = max_followups
+        self.local_classifier = local_classifier
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def chunk_titles(self, tasks: List[str], categories: List[str]) -> List[List[str]]:
+        base_cost = estimate_tokens(build_batch_prompt([], categories))
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        current_cost = base_cost
+        for title in tasks:
+            cost = 2 * estimate_tokens(title) + 4
+            if current and (current_cost + cost > self.max_prompt_tokens or len(current) >= self.max_titles_per_chunk):
+                chunks.append(current)
+                current = []
+                current_cost = base_cost
+            current.append(title)
+            current_cost += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _call_model(self, prompt: str) -> str:
+        """
+        One model call with timeout and retry/backoff on transient errors
+        (see `is_retryable`); anything else is raised at once.
+        """
+        metrics.gemma_prompt_tokens.observe(estimate_tokens(prompt))
+        attempt = 0
+        while True:
+            try:
+                async with self._get_semaphore():
+                    started = time.perf_counter()
+                    try:
+                        with tracing.span("gemma.call", attempt=attempt):
+                            text = await asyncio.wait_for(self.model(prompt), timeout=self.chunk_timeout)
+                    finally:
+                        metrics.gemma_duration.observe(time.perf_counter() - started)
+                metrics.gemma_calls.inc("ok")
+                return text
+            except Exception as e:
+                metrics.gemma_calls.inc("error")
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+                print(f"Gemma call failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Free-form model call sharing the service's client, concurrency limit,
+        timeout and retries (used by the free-time idea engine).
+        """
+        return await self._call_model(prompt)
+
+    async def _categorize_chunk(self, tasks: List[str], categories: List[str]) -> Dict[str, str]:
+        """
+        Validated results for one chunk. Titles the model omitted or mislabelled are
+        re-requested on their own (a smaller prompt) up to `max_followups` times;
+        whatever is still missing after that is left out, so callers don't cache it.
+        """
+        results: Dict[str, str] = {}
+        pending = tasks
+        for round_number in range(self.max_followups + 1):
+            metrics.gemma_batch_size.observe(len(pending))
+            try:
+                with tracing.span("gemma.prompt"):
+                    prompt = build_batch_prompt(pending, categories)
+                text = await self._call_model(prompt)
+            except Exception as e:
+                print(f"Error calling Gemma 3 Batch API: {type(e).__name__}: {e}")
+                break
+
+            with tracing.span("gemma.parse"):
+                valid, pending = validate_batch_result(parse_batch_response(text or ""), pending, categories)
+            results.update(valid)
+            if not pending:
+                break
+            print(f"Gemma batch response missing/invalid for {len(pending)} of {len(tasks)} tasks (round {round_number + 1})")
+        return results
+
+    async def categorize_batch(self, tasks: List[str], categories: List[str],
+                               sources: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Returns a dictionary mapping task_title -> category for every title the model
+        labelled validly. Titles it couldn't label are absent (not "Uncategorized"),
+        so they are retried on the next refresh instead of being cached.
+        If `sources` is given, it is filled with task_title -> "local" or "llm".
+        """
+        if not tasks:
+            return {}
+        if sources is None:
+            sources = {}
+
+        merged: Dict[str, str] = {}
+        if self.local_classifier is not None:
+            # Incremental: only cache entries the classifier hasn't seen are added
+            self.local_classifier.partial_fit(self.task_cache().training_pairs())
+            merged, tasks = self.local_classifier.classify(tasks, categories)
+            sources.update((title, SOURCE_LOCAL) for title in merged)
+            if merged:
+                print(f"Local classifier resolved {len(merged)} tasks, {len(tasks)} left for Gemma")
+            if not tasks:
+                return merged
+
+        chunks = self.chunk_titles(tasks, categories)
+        results = await asyncio.gather(*(self._categorize_chunk(chunk, categories) for chunk in chunks))
+        for result in results:
+            merged.update(result)
+            sources.update((title, SOURCE_LLM) for title in result)
+            if self.local_classifier is not None:
+                self.local_classifier.partial_fit(result.items())
+        return merged
+
+    async def categorize(self, task_title: str, categories: List[str], cache: Optional[Dict[str, str]] = None) -> str:
+        """
+        Categorizes one task, checking the cache first. With no explicit `cache`
+        dict, the shared normalized task cache is used.
+        """
+        # 1. Check Cache
+        use_external_cache = cache is not None
+        if use_external_cache:
+            cached_category = cache.get(task_title)
         else:
-            category = "Uncategorized"
+            shared_cache = self.task_cache()
+            cached_category = shared_cache.get(task_title, categories)
+
+        if cached_category is not None:
+            return cached_category
+
+        # 2. Call Gemma 3 API
+        try:
+            text = await self._call_model(build_single_prompt(task_title, categories))
+        except Exception as e:
+            print(f"Error calling Gemma 3 API: {type(e).__name__}: {e}")
+            return "Uncategorized"
+
+        # Basic cleanup, then validation against the allowed names
+        answer = text.strip().replace("```", "").replace("\n", "").strip() if text else ""
+        valid, _ = validate_batch_result({task_title: answer}, [task_title], categories)
+        if task_title not in valid:
+            return "Uncategorized"
+        category = valid[task_title]
 
         # 3. Update Cache
-        # Validation: check if response loosely matches a category (optional)
-        
-        cache[task_title] = category
-        
-        if not use_external_cache:
-            save_task_cache(cache)
-        
+        if use_external_cache:
+            cache[task_title] = category
+        else:
+            shared_cache.put(task_title, category, categories)
+            shared_cache.save()
         return category
 
-    except Exception as e:
-        print(f"Error calling Gemma 3 API: {e}")
-        return "Uncategorized"
+def categorize_task(task_title: str, categories: List[str], cache: Optional[Dict[str, str]] = None) -> str:
+    """
+    Synchronous wrapper for scripts. Inside the server, await the workspace's `categorizer.categorize`.
+    """
+    return asyncio.run(CategorizationService().categorize(task_title, categories, cache))
 
 def categorize_tasks_batch(tasks: List[str], categories: List[str]) -> Dict[str, str]:
     """
-    Categorizes a list of tasks in a single API call using Gemma 3.
-    Returns a dictionary mapping task_title -> category.
-    """
-    if not tasks:
-        return {}
-
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("Warning: GEMINI_API_KEY not found.")
-        return {t: "Uncategorized" for t in tasks}
-
-    try:
-        client = genai.Client(api_key=api_key)
-        
-        category_list_str = ", ".join(categories)
-        # Construct a clear JSON instruction prompt
-        prompt = (
-            f"You are a task management assistant. Classify the following tasks into exactly one of these categories: [{category_list_str}].\n"
-            f"Tasks: {tasks}\n"
-            f"Return ONLY a valid JSON object where keys are the task titles and values are the assigned categories.\n"
-            f"If a task does not fit well, pick the best match or 'Uncategorized'.\n"
-            f"JSON Format Example: {{ \"Buy milk\": \"Personal\", \"Finish code\": \"Work\" }}"
-        )
-        
-        response = client.models.generate_content(
-            model="gemma-3-4b-it", 
-            contents=prompt
-        )
-        
-        import json
-        if response.text:
-            cleaned_text = response.text.strip()
-            # Remove markdown code blocks if present (though response_mime_type might handle this, safety first)
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-                
-            results = json.loads(cleaned_text)
-            return results
-        else:
-            return {t: "Uncategorized" for t in tasks}
-
-    except Exception as e:
-        print(f"Error calling Gemma 3 Batch API: {e}")
-        return {t: "Uncategorized" for t in tasks}
+    Synchronous wrapper for scripts. Inside the server, await the workspace's `categorizer.categorize_batch`.
+    """
+    return asyncio.run(CategorizationService().categorize_batch(tasks, categories))
@@ -0,0 +1,114 @@
+"""
+HTTP caching helpers: ETags for the JSON endpoints and a static-file server
+with long-lived caching and precompressed assets for the frontend export.
+
+Precompress a build once after `npm run build`:
+
+    python -m backend.http_cache frontend/out
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# JSON endpoints: cache, but revalidate with If-None-Match every time
+REVALIDATE = "no-cache"
+# Content-hashed build output (Next.js puts it under /_next/static/)
+IMMUTABLE = "public, max-age=31536000, immutable"
+IMMUTABLE_PREFIXES = ("_next/static/",)
+
+# Precompressed siblings, in order of preference
+PRECOMPRESSED = ((".br", "br"), (".gz", "gzip"))
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".json", ".svg", ".txt", ".map", ".xml", ".webmanifest", ".ico"}
+
+def make_etag(*parts: Any) -> str:
+    """
+    Strong ETag from the given version parts (store versions, query string...).
+    """
+    return '"' + hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=8).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE, **(headers or {})})
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": REVALIDATE}
+
+def _precompressed(full_path: str, accept_encoding: str) -> Optional[Tuple[str, str]]:
+    accepted = {e.split(";")[0].strip() for e in accept_encoding.split(",")}
+    for suffix, encoding in PRECOMPRESSED:
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return None
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that marks hashed build assets immutable, makes everything else
+    revalidate (ETag/Last-Modified, answered with 304), and serves a `.br`/`.gz`
+    sibling when one exists and the client accepts it.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        compressed = _precompressed(full_path, request_headers.get("accept-encoding", ""))
+        if compressed:
+            compressed_path, encoding = compressed
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            response = FileResponse(compressed_path, status_code=status_code,
+                                    stat_result=os.stat(compressed_path), media_type=media_type)
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        relative = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, "/")
+        response.headers["Cache-Control"] = IMMUTABLE if relative.startswith(IMMUTABLE_PREFIXES) else REVALIDATE
+        response.headers["Vary"] = "Accept-Encoding"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+def precompress(directory: Path, min_size: int = 1024) -> int:
+    """
+    Writes .gz (and .br, if the optional `brotli` package is installed) next to
+    every compressible file of at least `min_size` bytes. Returns the number
+    of files compressed.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("brotli not installed; writing .gz only.")
+
+    count = 0
+    for path in directory.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES or path.stat().st_size < min_size:
+            continue
+        data = path.read_bytes()
+        path.with_name(path.name + ".gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli:
+            path.with_name(path.name + ".br").write_bytes(brotli.compress(data, quality=11))
+        count += 1
+    return count
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent.parent / "frontend" / "out")
+    print(f"Precompressed {precompress(target)} files in {target}")
@@ -0,0 +1,87 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+class FileLock:
+    """
+    Exclusive lock shared by threads and processes (uvicorn workers), backed by
+    an OS lock on a sidecar file. Re-entrant within a thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def _lock_file(self, blocking: bool) -> bool:
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                while True:
+                    try:
+                        msvcrt.locking(fd, mode, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ~10s; keep waiting when blocking
+                        if not blocking:
+                            raise
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def _unlock_file(self) -> None:
+        if os.name == "nt":
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0 and not self._lock_file(blocking):
+            self._thread_lock.release()
+            return False
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._unlock_file()
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+_locks: Dict[Path, FileLock] = {}
+_locks_guard = threading.Lock()
+
+def lock_for(path: Path) -> FileLock:
+    """
+    The process-wide lock guarding `path` (one FileLock object per file, so
+    threads in this process serialize on it too).
+    """
+    lock_path = path.with_name(path.name + ".lock")
+    with _locks_guard:
+        if lock_path not in _locks:
+            _locks[lock_path] = FileLock(lock_path)
+        return _locks[lock_path]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from . import metrics
+
+Sink = Callable[[List[Dict[str, Any]]], None]
+
+# A failed write is retried this many times, with doubling delays, before the
+# entries are dropped (and dumped to stderr so they can be recovered by hand)
+WRITE_RETRIES = 4
+RETRY_DELAY = 0.1
+
+class LogWriter:
+    """
+    Single background writer for the log endpoints.
+    Handlers enqueue entries and return immediately; the writer collects
+    everything that arrives within `window` seconds and commits it as one write
+    (and one fsync) per log, off the event loop. Later entries wait while a
+    failed write is retried, so each log keeps its order.
+    """
+
+    def __init__(self, sinks: Dict[str, Sink], window: float = 0.05, max_batch: int = 1000):
+        self.sinks = sinks
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def depth(self) -> int:
+        """
+        Entries queued but not yet written.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, log_name: str, entries: List[Dict[str, Any]]) -> None:
+        if not self.running:
+            # No writer loop (e.g. outside the app lifespan): write through
+            self.sinks[log_name](entries)
+            return
+        for entry in entries:
+            self._queue.put_nowait((log_name, entry))
+
+    async def flush(self) -> None:
+        """
+        Waits until everything enqueued so far is on disk.
+        """
+        if self.running:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, Dict[str, Any]]] = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            for log_name, entry in batch:
+                grouped[log_name].append(entry)
+            try:
+                for log_name, entries in grouped.items():
+                    await self._write(log_name, entries)
+                self.batches_written += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, log_name: str, entries: List[Dict[str, Any]]) -> None:
+        delay = RETRY_DELAY
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                await asyncio.to_thread(self.sinks[log_name], entries)
+                return
+            except Exception as e:
+                if attempt < WRITE_RETRIES:
+                    metrics.log_write_errors.inc(log_name, "retried")
+                    print(f"Error writing {len(entries)} {log_name} entries, retrying in {delay:g}s: {type(e).__name__}: {e}")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                else:
+                    metrics.log_write_errors.inc(log_name, "dropped")
+                    print(f"Dropped {len(entries)} {log_name} entries after {WRITE_RETRIES + 1} attempts: "
+                          f"{type(e).__name__}: {e}")
+                    for entry in entries:
+                        print(f"dropped {log_name}: {json.dumps(entry, ensure_ascii=False, default=str)}", file=sys.stderr)
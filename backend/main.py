@@ -7,87 +7,45 @@ env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(env_path)
 
 from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-import threading
 import time
-from windows_toasts import WindowsToaster, Toast
-
-from .database import load_config, save_config, append_history, get_history, load_task_cache, save_task_cache, append_pause_log, append_event_log
-from .todoist_client import TodoistManager
-from .gemini_client import categorize_task
+import datetime
+import random
+import asyncio
+
+from .database import parse_timestamp
+from .rollups import category_weights, week_key
+from .scheduler import ActiveSession
+from .events import format_sse
+from .workspaces import Workspace, WorkspaceMiddleware, current_workspace, workspaces
+from . import metrics, tracing
+from .http_cache import CachedStaticFiles, cache_headers, etag_matches, make_etag, not_modified
 
 # Define generic result type
 Result = Dict[str, Any]
 
-# Initialize clients
-todoist_manager = TodoistManager()
-
-# --- Session State Management ---
-from pydantic import BaseModel
-
-class ActiveSession(BaseModel):
-    task_name: str
-    category: str
-    duration_minutes: float
-    start_time: float # Unix timestamp
-    task_due_date: Optional[str] = None
-    related_tasks: List[Dict[str, Any]] = []
-    notified: bool = False
-
-current_session: Optional[ActiveSession] = None
+# Largest batch accepted by the /*/batch log endpoints and /tasks/complete
+MAX_BATCH_SIZE = 10000
 
-def monitor_sessions():
-    """
-    Background thread to check for expired sessions and trigger notifications.
-    """
-    print("Session monitor thread started.")
-    toaster = WindowsToaster('Kairos')
-    
-    while True:
-        try:
-            global current_session
-            if current_session:
-                now = time.time()
-                elapsed = now - current_session.start_time
-                duration_sec = current_session.duration_minutes * 60
-                
-                # Check if expired and not yet notified
-                if elapsed >= duration_sec and not current_session.notified:
-                    print(f"Session expired: {current_session.task_name}")
-                    
-                    # Trigger Toast
-                    new_toast = Toast()
-                    new_toast.text_fields = [f"Time's up! {current_session.task_name} is done."]
-                    try:
-                        toaster.show_toast(new_toast)
-                        print("Notification sent.")
-                    except Exception as e:
-                        print(f"Failed to send notification: {e}")
-                    
-                    # Mark as notified so we don't spam
-                    current_session.notified = True
-            
-            time.sleep(5) # Check every 5 seconds
-        except Exception as e:
-            print(f"Error in monitor thread: {e}")
-            time.sleep(5)
+# Seconds between keep-alive events on /session/events
+SSE_HEARTBEAT_INTERVAL = 15.0
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Backend started.")
-    
-    # Start Monitor Thread
-    monitor_thread = threading.Thread(target=monitor_sessions, daemon=True)
-    monitor_thread.start()
-    
+    # Every workspace's rollups warmup, log writer, session timers, task
+    # snapshot refresher and free-time scheduler
+    workspaces.start()
     yield
     # Shutdown
     print("Backend shutting down.")
+    await workspaces.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -100,163 +58,400 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (the task list, full history); SSE is left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Workspace from the /w/<name>/ prefix or X-Kairos-Workspace header
+app.add_middleware(WorkspaceMiddleware)
+
+# Per-route latency histograms, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+# Request traces (KAIROS_TRACE=1) and per-request profiles (X-Kairos-Profile header)
+app.add_middleware(tracing.TracingMiddleware)
+
 @app.get("/api/health")
-async def health_check():
-    return {"message": "Kairos Backend Running"}
+async def health_check(ws: Workspace = Depends(current_workspace)):
+    return {"message": "Kairos Backend Running", "workspace": ws.name, "log_queue_depth": ws.log_writer.depth()}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus text-format metrics: request latency per route, Todoist and Gemma
+    calls, task-cache hit ratio and JSON store I/O.
+    """
+    return Response(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Serve frontend build if it exists
 
 
 @app.get("/config")
-async def get_config_endpoint():
-    return load_config()
+async def get_config_endpoint(request: Request, ws: Workspace = Depends(current_workspace)):
+    """
+    Current config. Supports If-None-Match: an unchanged config is answered
+    with 304 without being serialized.
+    """
+    version = ws.data.config_version()
+    if version is None:
+        return ws.data.load_config()
+    etag = make_etag("config", version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return JSONResponse(ws.data.load_config(), headers=cache_headers(etag))
 
 @app.post("/config")
-async def update_config_endpoint(config: Dict[str, Any] = Body(...)):
-    save_config(config)
+async def update_config_endpoint(config: Dict[str, Any] = Body(...), ws: Workspace = Depends(current_workspace)):
+    ws.data.save_config(config)
     return {"status": "success"}
 
 @app.get("/history")
-async def get_history_endpoint():
-    return get_history()
+async def get_history_endpoint(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    ws: Workspace = Depends(current_workspace),
+):
+    """
+    Returns history entries, optionally filtered by time range (`since` inclusive,
+    `until` exclusive; Unix seconds/ms or ISO 8601) and category, and paginated with
+    `limit`/`cursor`. When more entries remain, the next cursor is sent in the
+    X-Next-Cursor header. Without parameters the whole history is returned.
+    Supports If-None-Match (304 until history is appended to).
+    """
+    # Read-your-writes: make sure queued appends are on disk first
+    await ws.log_writer.flush()
+    etag = make_etag("history", ws.data.history_version(), str(request.query_params))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers.update(cache_headers(etag))
+    if since is None and until is None and category is None and limit is None and cursor is None:
+        return ws.data.get_history()
+
+    since_ts = parse_timestamp(since)
+    until_ts = parse_timestamp(until)
+    if (since is not None and since_ts is None) or (until is not None and until_ts is None):
+        raise HTTPException(status_code=400, detail="Invalid since/until timestamp")
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    entries, next_cursor = ws.data.query_history(since_ts, until_ts, category, limit, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entries
 
 @app.post("/history")
-async def append_history_endpoint(entry: Dict[str, Any] = Body(...)):
-    append_history(entry)
+async def append_history_endpoint(entry: Dict[str, Any] = Body(...), ws: Workspace = Depends(current_workspace)):
+    ws.log_writer.enqueue("history", [entry])
     return {"status": "success"}
 
+async def write_log_batch(ws: Workspace, log_name: str, entries: List[Dict[str, Any]]) -> Result:
+    """
+    Persists a batch (e.g. events replayed by an offline client) as one write
+    and one fsync. Unlike the single-entry endpoints this answers only once the
+    entries are on disk, so the client can drop its local copy.
+    """
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} entries per batch")
+    # Entries enqueued earlier are written first, keeping the log in order
+    await ws.log_writer.flush()
+    await asyncio.to_thread(ws.log_writer.sinks[log_name], entries)
+    return {"status": "success", "count": len(entries)}
+
+@app.post("/history/batch")
+async def append_history_batch_endpoint(entries: List[Dict[str, Any]] = Body(...), ws: Workspace = Depends(current_workspace)):
+    return await write_log_batch(ws, "history", entries)
+
+@app.get("/stats/weekly")
+async def weekly_stats_endpoint(week: Optional[str] = Query(None, pattern=r"^\d{4}-W\d{2}$"),
+                                ws: Workspace = Depends(current_workspace)):
+    """
+    Time spent per category for an ISO week (default: current week), with the
+    decision-engine weight (Goal - Spent) * Priority for each configured category.
+    """
+    # Off the event loop: waits on the rollups lock while the startup build runs
+    totals = await asyncio.to_thread(ws.rollups.week_totals, week)
+    return {
+        "week": week or week_key(datetime.date.today()),
+        "categories": category_weights(ws.data.load_config(), totals),
+        "minutes_by_category": totals,
+    }
+
+@app.get("/analytics")
+async def analytics_endpoint(
+    request: Request,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    ws: Workspace = Depends(current_workspace),
+):
+    """
+    Aggregates over history and the pause log for local days in [since, until]
+    (ISO dates, default the last 28 days; longer ranges start at the first
+    logged day): minutes per category per day and ISO week, planned vs. actual
+    drift, pause frequency and length distribution, and activity streaks.
+    Computed server-side and memoized until a log grows.
+    """
+    if since is not None and since > (until or datetime.date.today()):
+        raise HTTPException(status_code=400, detail="since is after until")
+    await ws.log_writer.flush()
+    # Parses only newly appended entries (the whole logs on the first call)
+    version = await asyncio.to_thread(ws.analytics.catch_up)
+    etag = make_etag("analytics", version, since, until, datetime.date.today())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    summary = await asyncio.to_thread(ws.analytics.summary, since, until)
+    return JSONResponse(summary, headers=cache_headers(etag))
+
 @app.post("/pause_log")
-async def append_pause_log_endpoint(entry: Dict[str, Any] = Body(...)):
-    append_pause_log(entry)
+async def append_pause_log_endpoint(entry: Dict[str, Any] = Body(...), ws: Workspace = Depends(current_workspace)):
+    ws.log_writer.enqueue("pause_log", [entry])
     return {"status": "success"}
 
+@app.post("/pause_log/batch")
+async def append_pause_log_batch_endpoint(entries: List[Dict[str, Any]] = Body(...), ws: Workspace = Depends(current_workspace)):
+    return await write_log_batch(ws, "pause_log", entries)
+
 @app.post("/log_event")
-async def log_event_endpoint(entry: Dict[str, Any] = Body(...)):
-    append_event_log(entry)
+async def log_event_endpoint(entry: Dict[str, Any] = Body(...), ws: Workspace = Depends(current_workspace)):
+    ws.log_writer.enqueue("event_log", [entry])
     return {"status": "success"}
 
+@app.post("/log_event/batch")
+async def log_event_batch_endpoint(entries: List[Dict[str, Any]] = Body(...), ws: Workspace = Depends(current_workspace)):
+    return await write_log_batch(ws, "event_log", entries)
+
+# Shared by every workspace's decider
+decider_rng = random.Random()
+
+@app.get("/tasks")
 @app.post("/tasks")
-async def fetch_tasks_endpoint():
+async def fetch_tasks_endpoint(request: Request, response: Response, refresh: bool = False,
+                               ws: Workspace = Depends(current_workspace)):
     """
-    Fetch tasks from Todoist, check cache for categories, and invoke Gemini for uncategorized ones.
+    Returns the categorized task snapshot immediately (its age in seconds is sent in
+    X-Snapshot-Age). A stale snapshot is refreshed in the background; pass
+    `refresh=true` to wait for a fresh one instead.
+    GET supports If-None-Match: 304 while the snapshot hasn't changed.
     """
-    # 1. Fetch from Todoist
-    tasks = await todoist_manager.fetch_active_tasks()
-    
-    # 2. Categorize
-    config = load_config()
-    categories = [c["name"] for c in config.get("categories", [])]
-    
-    # Load cache ONCE
-    cache = load_task_cache()
-    original_cache_size = len(cache)
-    
-    # Identify miss
-    tasks_to_categorize = []
-    
-    for task in tasks:
-        if task["content"] in cache:
-            task["category"] = cache[task["content"]]
-        else:
-            tasks_to_categorize.append(task["content"])
-            # Temporarily mark as Uncategorized until batch returns
-            task["category"] = "Uncategorized"
-    
-    # Batch Process
-    if tasks_to_categorize:
-        print(f"Batch categorizing {len(tasks_to_categorize)} tasks...")
-        from .gemini_client import categorize_tasks_batch
-        new_categories = categorize_tasks_batch(tasks_to_categorize, categories)
-        
-        # Merge results back
-        for task in tasks:
-            if task["content"] in new_categories:
-                task["category"] = new_categories[task["content"]]
-                cache[task["content"]] = new_categories[task["content"]]
-            elif task["category"] == "Uncategorized" and task["content"] in cache:
-                 # Fallback if batch missed it but it was in cache (unlikely here but safety)
-                 task["category"] = cache[task["content"]]
-    
-    # Save cache if changed
-    if len(cache) > original_cache_size:
-        save_task_cache(cache)
-    
+    if refresh:
+        with tracing.span("snapshot.refresh"):
+            tasks = await ws.task_snapshot.refresh()
+        age = 0.0
+    else:
+        with tracing.span("snapshot.get"):
+            tasks, age = await ws.task_snapshot.get()
+    age_header = {"X-Snapshot-Age": f"{age:.1f}"}
+    etag = make_etag("tasks", ws.task_snapshot.fetched_at, ws.task_snapshot.version)
+    if request.method == "GET" and etag_matches(request, etag):
+        return not_modified(etag, age_header)
+    response.headers.update({**age_header, **cache_headers(etag)})
     return {"tasks": tasks}
 
+@app.post("/decide")
+async def decide_endpoint(ws: Workspace = Depends(current_workspace)):
+    """
+    Weighted random pick of the next category/task, done server-side.
+    Category weight is (Goal - Spent) * Priority; within a category tasks are ordered
+    by Todoist priority, then due date. With probability `free_time_chance` the
+    pick is free time instead (once free-time ideas have been generated).
+    """
+    # Serves the current snapshot (rebuilding the decider only on refresh)
+    await ws.task_snapshot.get()
+    decider = ws.task_decider
+    # Off the event loop: waits on the rollups lock while the startup build runs
+    await asyncio.to_thread(ws.rollups.catch_up)
+
+    # Refresh weights only when history or config changed: O(categories)
+    weights_key = (ws.rollups.version, id(ws.data.load_config()))
+    if weights_key != ws.task_decider_weights_key:
+        decider.update_weights(await asyncio.to_thread(ws.current_category_weights))
+        ws.task_decider_weights_key = weights_key
+
+    ideas = ws.free_time.offer(decider_rng, float(ws.data.load_config().get("free_time_chance", 0) or 0))
+    if ideas:
+        return {"type": "free_time", "ideas": ideas}
+
+    pick = decider.pick(decider_rng)
+    if pick is None:
+        return {"type": "none"}
+    return {"type": "task", **pick}
+
+@app.get("/free_time")
+async def free_time_endpoint(ws: Workspace = Depends(current_workspace)):
+    """
+    The current free-time build ideas. Served from the cache, never waiting on
+    the model; ideas are regenerated weekly in the background.
+    """
+    return ws.free_time.state()
+
+@app.post("/tasks/complete")
+async def complete_tasks_endpoint(task_ids: List[str] = Body(..., embed=True), ws: Workspace = Depends(current_workspace)):
+    """
+    Completes several tasks in Todoist concurrently. Always answers 200 with a
+    result per id; failed ids can be retried.
+    """
+    if len(task_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} tasks per request")
+    results = await ws.todoist.close_tasks(task_ids)
+    for task_id, success in results.items():
+        if success:
+            ws.task_snapshot.remove_task(task_id)
+            if ws.task_decider:
+                ws.task_decider.complete(task_id)
+    completed = sum(results.values())
+    return {
+        "completed": completed,
+        "failed": len(results) - completed,
+        "results": [{"task_id": task_id, "status": "success" if success else "error"}
+                    for task_id, success in results.items()],
+    }
+
 @app.post("/tasks/{task_id}/complete")
-async def complete_task_endpoint(task_id: str):
+async def complete_task_endpoint(task_id: str, ws: Workspace = Depends(current_workspace)):
     """
     Completes a task in Todoist.
     """
-    success = await todoist_manager.close_task(task_id)
+    success = await ws.todoist.close_task(task_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to close task in Todoist")
+    ws.task_snapshot.remove_task(task_id)
+    if ws.task_decider:
+        ws.task_decider.complete(task_id)
     return {"status": "success", "task_id": task_id}
 
 @app.post("/categorize")
-async def categorize_task_endpoint(task_title: str = Body(..., embed=True), categories: List[str] = Body(..., embed=True)):
+async def categorize_task_endpoint(task_title: str = Body(..., embed=True), categories: List[str] = Body(..., embed=True),
+                                   ws: Workspace = Depends(current_workspace)):
     """
     Direct endpoint to categorize a task.
     """
-    category = categorize_task(task_title, categories)
+    category = await ws.categorizer.categorize(task_title, categories)
     return {"category": category}
 
+@app.get("/categorize/stats")
+async def categorizer_stats_endpoint(ws: Workspace = Depends(current_workspace)):
+    """
+    Local classifier metrics, including the fraction of titles resolved without Gemma.
+    """
+    return ws.categorizer.local_classifier.stats()
+
 @app.post("/session/start")
-async def start_session_endpoint(session: ActiveSession = Body(...)):
-    global current_session
-    # If start_time is not provided or 0, set it to now
-    if not session.start_time:
-        session.start_time = time.time()
-    current_session = session
+async def start_session_endpoint(session: ActiveSession = Body(...), concurrent: bool = False,
+                                 ws: Workspace = Depends(current_workspace)):
+    """
+    Starts a session. By default it replaces any running sessions; pass
+    `concurrent=true` to run it alongside them.
+    """
+    session = ws.session_scheduler.start(session, replace=not concurrent)
     print(f"Session started provided: {session.task_name} at {session.start_time}")
-    return {"status": "success", "session": current_session}
+    return {"status": "success", "session": session}
 
 @app.get("/session/current")
-async def get_current_session_endpoint():
-    global current_session
+async def get_current_session_endpoint(ws: Workspace = Depends(current_workspace)):
+    current_session = ws.session_scheduler.current()
     if current_session:
-        # Calculate elapsed/remaining logic if needed, or just return the static data
         # The frontend can calculate remaining time based on start_time and duration
-        return {"active": True, "session": current_session, "server_time": time.time()}
+        return {
+            "active": True,
+            "session": current_session,
+            "sessions": list(ws.session_scheduler.sessions.values()),
+            "server_time": time.time(),
+        }
     return {"active": False}
 
 @app.post("/session/stop")
-async def stop_session_endpoint():
-    global current_session
-    current_session = None
+async def stop_session_endpoint(session_id: Optional[str] = None, ws: Workspace = Depends(current_workspace)):
+    """
+    Stops the given session, or all sessions when no id is given.
+    """
+    ws.session_scheduler.stop(session_id)
     print("Session stopped/cleared.")
     return {"status": "success"}
 
+@app.post("/session/extend")
+async def extend_session_endpoint(minutes: float = Body(..., embed=True, gt=0), session_id: Optional[str] = Body(None, embed=True),
+                                  ws: Workspace = Depends(current_workspace)):
+    """
+    Extends a session (+5m/+15m/+30m/+1h buttons) and reschedules its expiry.
+    Defaults to the current session.
+    """
+    if session_id is None:
+        current_session = ws.session_scheduler.current()
+        session_id = current_session.session_id if current_session else None
+    session = ws.session_scheduler.extend(session_id, minutes) if session_id else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="No such active session")
+    return {"status": "success", "session": session}
+
 @app.post("/session/timeout")
-async def timeout_session_endpoint():
+async def timeout_session_endpoint(session_id: Optional[str] = None, ws: Workspace = Depends(current_workspace)):
     """
     Called when the frontend timer finishes. 
     Triggers immediate notification (if not already sent) but keeps the session active (so feedback can be entered).
     Marks session as notified.
     """
-    global current_session
+    ws.session_scheduler.refresh()
+    current_session = ws.session_scheduler.sessions.get(session_id) if session_id else ws.session_scheduler.current()
     if current_session:
-        # 1. Trigger Notification Immediately (if not yet)
-        if not current_session.notified:
-             print(f"Session timeout triggered via endpoint: {current_session.task_name}")
-             toaster = WindowsToaster('Kairos')
-             new_toast = Toast()
-             new_toast.text_fields = [f"Time's up! {current_session.task_name} is done."]
-             try:
-                toaster.show_toast(new_toast)
-             except Exception as e:
-                print(f"Failed to send notification: {e}")
-             current_session.notified = True
-
+        ws.session_scheduler.expire(current_session.session_id)
         return {"status": "success", "message": "Session marked as timed out but kept active."}
     
     return {"status": "error", "message": "No active session"}
 
 
+@app.get("/session/events")
+async def session_events_endpoint(request: Request, last_event_id: Optional[str] = None,
+                                  ws: Workspace = Depends(current_workspace)):
+    """
+    Server-Sent Events stream of session start/stop/extend/timeout events, each
+    carrying the session and the server time, plus periodic heartbeat events.
+    Reconnecting clients resume after the Last-Event-ID header (or `last_event_id`);
+    new clients, ones too far behind, and ones whose id comes from before a
+    restart or from another worker first get a `state` snapshot.
+    """
+    broker = ws.session_events
+    resume_id = broker.parse_id(request.headers.get("last-event-id") or last_event_id)
+
+    ws.session_scheduler.refresh()
+    queue, backlog = broker.subscribe(resume_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if resume_id is None or backlog is None:
+                state = {
+                    "sessions": [s.model_dump() for s in ws.session_scheduler.sessions.values()],
+                    "server_time": time.time(),
+                }
+                yield format_sse("state", state, broker.format_id(broker.last_event_id))
+            for event_id, event_type, data in backlog or []:
+                yield format_sse(event_type, data, broker.format_id(event_id))
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield format_sse("heartbeat", {"server_time": time.time()})
+                    continue
+                if event is None:
+                    break
+                event_id, event_type, data = event
+                yield format_sse(event_type, data, broker.format_id(event_id))
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
 # Serve frontend build if it exists
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "out")
 if os.path.exists(frontend_path):
-    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+    # Hashed assets are cached for a year; pages revalidate; .br/.gz served when present
+    app.mount("/", CachedStaticFiles(directory=frontend_path, html=True), name="static")
 else:
     @app.get("/")
     async def root():
@@ -0,0 +1,214 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Prometheus-style metrics kept as plain in-process counters.
+# Recording is an uncontended lock and an add; text is only produced when
+# /metrics is scraped, so the cost is near zero when nobody is looking.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000)
+
+Labels = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _format_labels(self, labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, labels))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{self._format_labels(labels)} {value:g}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series_list = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in series_list:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {total:g}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {count}")
+        return lines
+
+REGISTRY: List[Metric] = []
+
+def render_metrics() -> str:
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- HTTP ---
+
+http_request_duration = Histogram(
+    "kairos_http_request_duration_seconds",
+    "Time from request received to response headers sent, per route.",
+    ("method", "route", "status"))
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request up to its response start, labelled
+    with the matched route template (e.g. /tasks/{task_id}/complete) so ids don't
+    explode the label set. Streaming responses are timed to their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = ["500"]
+        recorded = [False]
+
+        def record() -> None:
+            if recorded[0]:
+                return
+            recorded[0] = True
+            route = scope.get("route")
+            route_name = getattr(route, "path", "") or getattr(route, "name", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route_name, status[0])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+                record()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+
+# --- Todoist ---
+
+todoist_duration = Histogram(
+    "kairos_todoist_request_duration_seconds",
+    "Latency of Todoist API calls.",
+    ("operation",))
+todoist_errors = Counter(
+    "kairos_todoist_errors_total",
+    "Todoist API calls that failed.",
+    ("operation",))
+
+# --- Gemma ---
+
+gemma_calls = Counter(
+    "kairos_gemma_calls_total",
+    "Gemma generate calls (including retries), by outcome.",
+    ("outcome",))
+gemma_duration = Histogram(
+    "kairos_gemma_call_duration_seconds",
+    "Latency of single Gemma generate calls.")
+gemma_batch_size = Histogram(
+    "kairos_gemma_batch_size",
+    "Titles per Gemma batch prompt.",
+    buckets=SIZE_BUCKETS)
+gemma_prompt_tokens = Histogram(
+    "kairos_gemma_prompt_tokens",
+    "Estimated tokens per Gemma prompt.",
+    buckets=TOKEN_BUCKETS)
+
+# --- Task categories ---
+
+task_cache_lookups = Counter(
+    "kairos_task_cache_lookups_total",
+    "Task category cache lookups while loading tasks, by result (hit/miss).",
+    ("result",))
+
+# --- Storage ---
+
+store_bytes = Counter(
+    "kairos_store_bytes_total",
+    "Bytes read from or written to the JSON/JSONL stores.",
+    ("file", "op"))
+store_duration = Histogram(
+    "kairos_store_duration_seconds",
+    "Time spent reading or writing the JSON/JSONL stores.",
+    ("file", "op"))
+log_write_errors = Counter(
+    "kairos_log_write_errors_total",
+    "Failed background log writes, by log and outcome (retried/dropped).",
+    ("log", "outcome"))
@@ -0,0 +1,45 @@
+import importlib.util
+import sys
+from typing import Any, Optional, Protocol
+
+class Notifier(Protocol):
+    def notify(self, message: str) -> None:
+        ...
+
+class WindowsToastNotifier:
+    """
+    Desktop toast via windows_toasts (Windows only). The package is imported
+    and the toaster built on the first notification, not at startup.
+    """
+
+    def __init__(self, app_name: str = "Kairos"):
+        self.app_name = app_name
+        self.toaster: Optional[Any] = None
+
+    def notify(self, message: str) -> None:
+        from windows_toasts import Toast, WindowsToaster
+        if self.toaster is None:
+            self.toaster = WindowsToaster(self.app_name)
+        new_toast = Toast()
+        new_toast.text_fields = [message]
+        try:
+            self.toaster.show_toast(new_toast)
+            print("Notification sent.")
+        except Exception as e:
+            print(f"Failed to send notification: {e}")
+
+class ConsoleNotifier:
+    """
+    Fallback for platforms without toast support.
+    """
+
+    def notify(self, message: str) -> None:
+        print(f"Notification: {message}")
+
+def get_default_notifier() -> Notifier:
+    if sys.platform == "win32":
+        # Only checks that the package exists; importing it is left to the first toast
+        if importlib.util.find_spec("windows_toasts") is not None:
+            return WindowsToastNotifier()
+        print("windows_toasts not installed, notifications go to the console.")
+    return ConsoleNotifier()
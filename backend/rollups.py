@@ -0,0 +1,76 @@
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from .database import entry_timestamp, entry_category, entry_minutes, read_history_since
+
+def week_key(day: date) -> str:
+    iso_year, iso_week, _ = day.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+class TimeRollups:
+    """
+    Running totals of minutes spent per category per ISO week.
+    Built from the history log once at startup, then kept current by `catch_up`,
+    which reads only the entries appended since (by any worker process).
+    `read_since` is the store's history cursor reader.
+    """
+
+    def __init__(self, read_since: Callable[[Optional[int]], Tuple[List[Dict[str, Any]], int]] = read_history_since):
+        self.read_since = read_since
+        self._lock = threading.Lock()
+        self.weekly: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.version = 0
+        self._cursor: Optional[int] = None
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        ts = entry_timestamp(entry)
+        minutes = entry_minutes(entry)
+        if ts is None or not minutes:
+            return
+        day = datetime.fromtimestamp(ts).date()
+        category = entry_category(entry) or "Uncategorized"
+        self.weekly[week_key(day)][category] += minutes
+
+    def catch_up(self) -> None:
+        """
+        Folds in history appended since the last call.
+        """
+        with self._lock:
+            entries, self._cursor = self.read_since(self._cursor)
+            for entry in entries:
+                self._add(entry)
+            if entries:
+                self.version += 1
+
+    def week_totals(self, week: Optional[str] = None) -> Dict[str, float]:
+        """
+        Minutes per category for an ISO week ("2025-W07"), default the current week.
+        """
+        key = week or week_key(date.today())
+        self.catch_up()
+        with self._lock:
+            return dict(self.weekly.get(key, {}))
+
+def category_weights(config: Dict[str, Any], week_totals: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Decision-engine weight per configured category: (Goal - Spent) * Priority,
+    clamped at zero once the weekly goal is met. O(categories).
+    """
+    weights = []
+    for category in config.get("categories", []):
+        name = category.get("name")
+        target_hours = float(category.get("target_hours", 0) or 0)
+        priority = float(category.get("priority", 1) or 0)
+        spent_hours = week_totals.get(name, 0.0) / 60.0
+        remaining_hours = max(0.0, target_hours - spent_hours)
+        weights.append({
+            "name": name,
+            "target_hours": target_hours,
+            "spent_hours": round(spent_hours, 3),
+            "remaining_hours": round(remaining_hours, 3),
+            "priority": priority,
+            "weight": remaining_hours * priority,
+        })
+    return weights
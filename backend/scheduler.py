@@ -0,0 +1,262 @@
+import asyncio
+import heapq
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .database import _load_json, _save_json, _file_signature
+from .locks import lock_for
+from .notifications import Notifier
+
+class ActiveSession(BaseModel):
+    task_name: str
+    category: str
+    duration_minutes: float
+    start_time: float # Unix timestamp
+    task_due_date: Optional[str] = None
+    related_tasks: List[Dict[str, Any]] = []
+    notified: bool = False
+    session_id: Optional[str] = None
+
+    def deadline(self) -> float:
+        return self.start_time + self.duration_minutes * 60
+
+class SessionStore:
+    """
+    Active sessions in a JSON file shared by every worker process.
+    Changes are read-modify-write under the file lock; readers re-parse only
+    when the file's mtime/size changed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = lock_for(path)
+        self._signature: Optional[tuple] = None
+
+    def changed(self) -> bool:
+        return _file_signature(self.path) != self._signature
+
+    def load(self) -> Dict[str, ActiveSession]:
+        with self._lock:
+            self._signature = _file_signature(self.path)
+            raw = _load_json(self.path, {})
+        return {session_id: ActiveSession(**data) for session_id, data in raw.items()}
+
+    @contextmanager
+    def update(self) -> Iterator[Dict[str, ActiveSession]]:
+        """
+        Yields the current sessions under the lock and writes them back afterwards.
+        """
+        with self._lock:
+            sessions = self.load()
+            yield sessions
+            _save_json(self.path, {session_id: s.model_dump() for session_id, s in sessions.items()})
+            self._signature = _file_signature(self.path)
+
+class SessionScheduler:
+    """
+    Fires a notification exactly when each session expires.
+    Deadlines live in a min-heap and a single loop.call_at timer is armed for the
+    earliest one, so nothing wakes up while idle. Starting, stopping or extending a
+    session re-arms the timer; superseded heap entries are skipped lazily.
+
+    With a `store`, sessions are shared between worker processes: every change
+    goes through the store, `refresh` picks up changes made by other workers
+    (emitting the matching events locally), and only the leader worker arms
+    timers and sends notifications.
+    """
+
+    def __init__(self, notifier: Notifier, on_event: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                 store: Optional[SessionStore] = None):
+        self.notifier = notifier
+        self.on_event = on_event
+        self.store = store
+        self.leader = True
+        self.sessions: Dict[str, ActiveSession] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        if store is not None:
+            self.sessions = store.load()
+            for session in self.sessions.values():
+                self._push(session)
+
+    def attach(self, loop: asyncio.AbstractEventLoop, leader: bool = True) -> None:
+        self._loop = loop
+        self.leader = leader
+        self._arm()
+
+    def set_leader(self, leader: bool) -> None:
+        self.leader = leader
+        self._arm()
+
+    def detach(self) -> None:
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        self._loop = None
+
+    # --- Session operations ---
+
+    def start(self, session: ActiveSession, replace: bool = True) -> ActiveSession:
+        # If start_time is not provided or 0, set it to now
+        if not session.start_time:
+            session.start_time = time.time()
+        if not session.session_id:
+            session.session_id = uuid.uuid4().hex
+        replaced: List[ActiveSession] = []
+        with self._update() as sessions:
+            if replace:
+                replaced = list(sessions.values())
+                sessions.clear()
+            sessions[session.session_id] = session
+        # Replaced sessions end as if stopped, so subscribers don't keep them open
+        for old in replaced:
+            self._emit("stop", old)
+        self._push(session)
+        self._emit("start", session)
+        return session
+
+    def stop(self, session_id: Optional[str] = None) -> List[ActiveSession]:
+        """
+        Stops one session, or all of them when no id is given.
+        """
+        with self._update() as sessions:
+            if session_id is None:
+                stopped = list(sessions.values())
+                sessions.clear()
+            else:
+                session = sessions.pop(session_id, None)
+                stopped = [session] if session else []
+        self._arm()
+        for session in stopped:
+            self._emit("stop", session)
+        return stopped
+
+    def extend(self, session_id: str, minutes: float) -> Optional[ActiveSession]:
+        with self._update() as sessions:
+            session = sessions.get(session_id)
+            if session is None:
+                return None
+            session.duration_minutes += minutes
+            session.notified = False
+        self._push(session)
+        self._emit("extend", session)
+        return session
+
+    def expire(self, session_id: str) -> Optional[ActiveSession]:
+        """
+        Timeout reported by the frontend: notify now if we haven't already.
+        The session stays active so feedback can be entered.
+        """
+        with self._update() as sessions:
+            session = sessions.get(session_id)
+            if session is None or session.notified:
+                return session
+            session.notified = True
+        self._notify(session)
+        return session
+
+    def current(self) -> Optional[ActiveSession]:
+        """
+        Most recently started session.
+        """
+        self.refresh()
+        if not self.sessions:
+            return None
+        return max(self.sessions.values(), key=lambda s: s.start_time)
+
+    def refresh(self) -> None:
+        """
+        Picks up session changes made by other workers.
+        """
+        if self.store is not None and self.store.changed():
+            self._apply(self.store.load())
+
+    def _apply(self, sessions: Dict[str, ActiveSession]) -> None:
+        """
+        Replaces the local view with `sessions` (as read from the store) and emits
+        events for whatever other workers changed, as if it had happened here.
+        """
+        previous, self.sessions = self.sessions, sessions
+        for session_id, session in sessions.items():
+            old = previous.get(session_id)
+            if old is None:
+                self._push(session)
+                self._emit("start", session)
+            elif session.deadline() != old.deadline():
+                self._push(session)
+                self._emit("extend", session)
+            elif session.notified and not old.notified:
+                self._emit("timeout", session)
+        for session_id, session in previous.items():
+            if session_id not in sessions:
+                self._emit("stop", session)
+        self._arm()
+
+    @contextmanager
+    def _update(self) -> Iterator[Dict[str, ActiveSession]]:
+        if self.store is None:
+            yield self.sessions
+            return
+        with self.store.update() as sessions:
+            # Catch up on other workers' changes before applying ours
+            self._apply(sessions)
+            yield sessions
+
+    def _emit(self, event_type: str, session: ActiveSession) -> None:
+        if self.on_event:
+            self.on_event(event_type, {"session": session.model_dump()})
+
+    # --- Timer ---
+
+    def _push(self, session: ActiveSession) -> None:
+        self._counter += 1
+        heapq.heappush(self._heap, (session.deadline(), self._counter, session.session_id))
+        self._arm()
+
+    def _is_live(self, entry: Tuple[float, int, str]) -> bool:
+        deadline, _, session_id = entry
+        session = self.sessions.get(session_id)
+        return session is not None and not session.notified and session.deadline() == deadline
+
+    def _arm(self) -> None:
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if not self._heap or self._loop is None or not self.leader:
+            return
+
+        delay = max(0.0, self._heap[0][0] - time.time())
+        self._handle = self._loop.call_at(self._loop.time() + delay, self._fire)
+
+    def _fire(self) -> None:
+        self._handle = None
+        now = time.time()
+        due = []
+        with self._update() as sessions:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                session = sessions.get(entry[2])
+                if session and not session.notified and session.deadline() == entry[0]:
+                    session.notified = True
+                    due.append(session)
+        for session in due:
+            self._notify(session)
+        self._arm()
+
+    def _notify(self, session: ActiveSession) -> None:
+        print(f"Session expired: {session.task_name}")
+        self._emit("timeout", session)
+        try:
+            self.notifier.notify(f"Time's up! {session.task_name} is done.")
+        except Exception as e:
+            print(f"Failed to send notification: {e}")
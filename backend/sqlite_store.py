@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from .database import JsonlLog, entry_timestamp, entry_category, entry_task_name, _load_json
+
+LOG_TABLES = ("history", "pause_log", "event_log")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL,
+    category TEXT,
+    task_name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_ts ON history (ts);
+CREATE INDEX IF NOT EXISTS idx_history_category_ts ON history (category, ts);
+CREATE INDEX IF NOT EXISTS idx_history_task_name ON history (task_name);
+CREATE TABLE IF NOT EXISTS pause_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL,
+    category TEXT,
+    task_name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pause_log_ts ON pause_log (ts);
+CREATE TABLE IF NOT EXISTS event_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL,
+    category TEXT,
+    task_name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_event_log_ts ON event_log (ts);
+CREATE TABLE IF NOT EXISTS task_cache (
+    title TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class SqliteStore:
+    """
+    SQLite replacement for the JSON/JSONL files (history, pause log, event log and
+    task cache). Enabled with KAIROS_STORAGE=sqlite; config.json stays a file.
+    On first open, existing JSON data is imported once.
+    """
+
+    def __init__(self, path: Path, legacy_logs: Dict[str, JsonlLog], legacy_cache_path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Several worker processes may share the file: WAL plus a busy timeout lets
+        # writers queue on each other's transactions instead of failing
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._task_cache: Optional[Dict[str, Any]] = None
+        self._persisted_cache: Dict[str, str] = {}
+        self._cache_version: Optional[str] = None
+        self._import_legacy(legacy_logs, legacy_cache_path)
+
+    def _import_legacy(self, legacy_logs: Dict[str, JsonlLog], legacy_cache_path: Path) -> None:
+        with self._lock:
+            # Take the write lock up front so only one worker process imports
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone()
+            if row:
+                self._conn.rollback()
+                return
+            for table, log in legacy_logs.items():
+                entries = log.read_all()
+                self._insert(table, entries)
+                if entries:
+                    print(f"Imported {len(entries)} {table} entries into {self.path.name}")
+
+            if legacy_cache_path.exists():
+                cache = _load_json(legacy_cache_path, {})
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO task_cache (title, value) VALUES (?, ?)",
+                    [(title, json.dumps(value)) for title, value in cache.items()]
+                )
+
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('imported', '1')")
+            self._conn.commit()
+
+    def _insert(self, table: str, entries: Iterable[Dict[str, Any]]) -> None:
+        self._conn.executemany(
+            f"INSERT INTO {table} (ts, category, task_name, data) VALUES (?, ?, ?, ?)",
+            [
+                (entry_timestamp(e), entry_category(e), entry_task_name(e), json.dumps(e, ensure_ascii=False))
+                for e in entries
+            ]
+        )
+
+    # --- Logs ---
+
+    def append_many(self, table: str, entries: Iterable[Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._insert(table, entries)
+
+    def read_since(self, table: str, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Rows with id > cursor, and the new cursor.
+        """
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, data FROM {table} WHERE id > ? ORDER BY id", (cursor,)).fetchall()
+        if not rows:
+            return [], cursor
+        return [json.loads(data) for _, data in rows], rows[-1][0]
+
+    def version(self, table: str) -> int:
+        """
+        Id of the newest row; logs are append-only, so this changes on every append.
+        """
+        with self._lock:
+            return self._conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    def read_all(self, table: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM {table} ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def query(self, table: str, since: Optional[float] = None, until: Optional[float] = None,
+              category: Optional[str] = None, limit: Optional[int] = None,
+              cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Filtered page of a log, in insertion order. `since` is inclusive and
+        `until` exclusive (Unix seconds). The cursor is the id of the last row
+        returned; pass it back to fetch the next page.
+        """
+        if limit is not None and limit <= 0:
+            return [], None
+        clauses = []
+        params: List[Any] = []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if cursor is not None:
+            clauses.append("id > ?")
+            params.append(int(cursor))
+
+        sql = f"SELECT id, data FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit is not None:
+            # One extra row tells us whether there is a next page
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = str(rows[-1][0])
+        return [json.loads(data) for _, data in rows], next_cursor
+
+    # --- Task cache ---
+
+    def load_task_cache(self) -> Dict[str, Any]:
+        with self._lock:
+            # Bumped on every save, so changes made by other workers are picked up
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'task_cache_version'").fetchone()
+            version = row[0] if row else None
+            if self._task_cache is None or version != self._cache_version:
+                self._cache_version = version
+                rows = self._conn.execute("SELECT title, value FROM task_cache").fetchall()
+                self._persisted_cache = dict(rows)
+                self._task_cache = {title: json.loads(value) for title, value in rows}
+            return self._task_cache
+
+    def save_task_cache(self, data: Dict[str, Any]) -> None:
+        """
+        Writes only the entries that changed since the last save.
+        """
+        with self._lock:
+            encoded = {title: json.dumps(value) for title, value in data.items()}
+            upserts = [(t, v) for t, v in encoded.items() if self._persisted_cache.get(t) != v]
+            deletes = [(t,) for t in self._persisted_cache if t not in encoded]
+            with self._conn:
+                if upserts:
+                    self._conn.executemany("INSERT OR REPLACE INTO task_cache (title, value) VALUES (?, ?)", upserts)
+                if deletes:
+                    self._conn.executemany("DELETE FROM task_cache WHERE title = ?", deletes)
+                if upserts or deletes:
+                    self._cache_version = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('task_cache_version', ?)",
+                        (self._cache_version,)
+                    )
+            self._persisted_cache = encoded
+            self._task_cache = data
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
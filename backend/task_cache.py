@@ -0,0 +1,244 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Set, Tuple
+
+from .database import DataStore, default_store
+
+# LRU bound on task_cache.json entries
+MAX_CACHE_ENTRIES = 5000
+
+# MinHash near-duplicate lookup on cache misses (KAIROS_NEAR_DUPLICATES=0 turns it off)
+NEAR_DUPLICATES = os.environ.get("KAIROS_NEAR_DUPLICATES", "1") == "1"
+# NUM_BANDS * ROWS_PER_BAND hash functions
+NUM_BANDS = 8
+ROWS_PER_BAND = 4
+NEAR_DUPLICATE_THRESHOLD = 0.75
+
+# Where an entry's label came from; the local classifier only trains on
+# labels it didn't produce itself
+SOURCE_LLM = "llm"
+SOURCE_USER = "user"
+SOURCE_LOCAL = "local"
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+    for i in range(NUM_BANDS * ROWS_PER_BAND)
+]
+
+_MONTHS = r"jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec"
+_DATE_PATTERNS = [
+    re.compile(r"\b\d{4}-\d{1,2}-\d{1,2}\b"),
+    re.compile(r"\b\d{1,2}[/.]\d{1,2}(?:[/.]\d{2,4})?\b"),
+    re.compile(rf"\b(?:{_MONTHS})[a-z]*\.?\s+\d{{1,2}}(?:st|nd|rd|th)?\b"),
+    re.compile(rf"\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:{_MONTHS})[a-z]*\b"),
+]
+
+def normalize_title(title: str) -> str:
+    """
+    Cache key for a task title: case-folded, dates removed, digit runs replaced by
+    "#", trailing punctuation stripped and whitespace collapsed, so "PSET 4" and
+    "pset 5." share an entry. Titles that would be left without letters ("10/12",
+    "42") keep their case-folded text instead of all sharing one key.
+    """
+    raw = title.casefold()
+    text = raw
+    for pattern in _DATE_PATTERNS:
+        text = pattern.sub(" ", text)
+    text = re.sub(r"\d+", "#", text)
+    text = " ".join(text.split())
+    text = text.rstrip(".,;:!?-–— ").strip()
+    if not any(c.isalpha() for c in text):
+        return " ".join(raw.split())
+    return text
+
+def category_set_hash(categories: List[str]) -> str:
+    """
+    Version tag for the configured category set; labels made under a different set
+    are treated as stale.
+    """
+    return hashlib.sha1("\n".join(sorted(categories)).encode("utf-8")).hexdigest()[:12]
+
+def _shingles(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+def _minhash(key: str) -> Tuple[int, ...]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in _shingles(key)]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]) for band in range(NUM_BANDS)]
+
+class TaskCategoryCache:
+    """
+    Title -> category cache on top of task_cache.json.
+    Keys are normalized titles; each entry records the category-set hash it was
+    labelled under (stale entries are dropped when next read) and its source, and the cache is
+    bounded with LRU eviction. Misses can fall back to a MinHash/LSH near-duplicate
+    lookup over the normalized keys.
+    """
+
+    def __init__(self, data: DataStore = default_store, max_entries: int = MAX_CACHE_ENTRIES,
+                 near_duplicates: bool = NEAR_DUPLICATES):
+        self.data = data
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self._lock = threading.RLock()
+        self._source: Any = None
+        self.dirty = False
+
+    # --- Persistence ---
+
+    def sync_from_store(self) -> None:
+        """
+        (Re)loads from the task-cache store if it was replaced (e.g. the file changed
+        on disk). Legacy {title: category} entries are migrated on the fly.
+        """
+        raw = self.data.load_task_cache()
+        if raw is self._source:
+            return
+        with self._lock:
+            self.entries.clear()
+            self._signatures.clear()
+            self._buckets.clear()
+            for key, value in raw.items():
+                if isinstance(value, str):
+                    # Legacy entry: raw title -> category, no category-set tag
+                    self._insert(normalize_title(key), {"title": key, "category": value, "categories_hash": None})
+                elif isinstance(value, dict) and "category" in value:
+                    self._insert(key, value)
+            self._evict()
+            self._source = raw
+
+    def save(self) -> None:
+        with self._lock:
+            if not self.dirty:
+                return
+            data = dict(self.entries)
+            self._source = data
+            self.dirty = False
+        self.data.save_task_cache(data)
+
+    # --- Index ---
+
+    def _insert(self, key: str, entry: Dict[str, Any]) -> None:
+        if key in self.entries:
+            self._unindex(key)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if self.near_duplicates:
+            signature = _minhash(key)
+            self._signatures[key] = signature
+            for band in _bands(signature):
+                self._buckets.setdefault(band, set()).add(key)
+
+    def _unindex(self, key: str) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band in _bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _remove(self, key: str) -> None:
+        self._unindex(key)
+        self.entries.pop(key, None)
+        self.dirty = True
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            key = next(iter(self.entries))
+            self._remove(key)
+
+    def _is_current(self, key: str, categories: List[str], categories_hash: str) -> bool:
+        entry = self.entries[key]
+        if entry.get("categories_hash") == categories_hash:
+            return True
+        if entry.get("categories_hash") is None and (entry["category"] in categories or entry["category"] == "Uncategorized"):
+            # Legacy label that is still a valid choice: adopt it under the current set
+            entry["categories_hash"] = categories_hash
+            self.dirty = True
+            return True
+        self._remove(key)
+        return False
+
+    def _near_duplicate(self, key: str) -> Optional[str]:
+        signature = _minhash(key)
+        candidates: Set[str] = set()
+        for band in _bands(signature):
+            candidates |= self._buckets.get(band, set())
+
+        # LSH only proposes candidates; confirm with the exact shingle Jaccard
+        shingles = _shingles(key)
+        best, best_similarity = None, NEAR_DUPLICATE_THRESHOLD
+        for candidate in candidates:
+            other = _shingles(candidate)
+            similarity = len(shingles & other) / len(shingles | other)
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    # --- Lookups ---
+
+    def get(self, title: str, categories: List[str]) -> Optional[str]:
+        categories_hash = category_set_hash(categories)
+        key = normalize_title(title)
+        with self._lock:
+            if key in self.entries and self._is_current(key, categories, categories_hash):
+                self.entries.move_to_end(key)
+                return self.entries[key]["category"]
+
+            if self.near_duplicates and self.entries:
+                match = self._near_duplicate(key)
+                if match is not None and self._is_current(match, categories, categories_hash):
+                    self.entries.move_to_end(match)
+                    return self.entries[match]["category"]
+        return None
+
+    def put(self, title: str, category: str, categories: List[str], source: str = SOURCE_LLM) -> None:
+        with self._lock:
+            self._insert(normalize_title(title), {
+                "title": title,
+                "category": category,
+                "categories_hash": category_set_hash(categories),
+                "source": source,
+            })
+            self.dirty = True
+            self._evict()
+
+    def training_pairs(self) -> Iterator[Tuple[str, str]]:
+        """
+        (title, category) for every entry the local classifier didn't label itself,
+        so it never trains on its own predictions. Entries without a source predate
+        the local classifier.
+        """
+        with self._lock:
+            pairs = [(entry["title"], entry["category"]) for entry in self.entries.values()
+                     if entry.get("source") != SOURCE_LOCAL]
+        return iter(pairs)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+# One cache per data store (workspace)
+_task_category_caches: Dict[Path, TaskCategoryCache] = {}
+_caches_guard = threading.Lock()
+
+def get_task_category_cache(data: DataStore = default_store) -> TaskCategoryCache:
+    with _caches_guard:
+        cache = _task_category_caches.get(data.data_dir)
+        if cache is None:
+            cache = _task_category_caches[data.data_dir] = TaskCategoryCache(data)
+    cache.sync_from_store()
+    return cache
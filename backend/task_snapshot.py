@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
+
+TaskList = List[Dict[str, Any]]
+
+class TaskSnapshot:
+    """
+    Stale-while-revalidate holder for the categorized task list.
+    Readers get the last snapshot immediately; a stale snapshot triggers a
+    background refresh, and concurrent refreshes share one in-flight load
+    (single-flight).
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[TaskList]],
+                 max_age: float = 60.0, refresh_interval: float = 300.0,
+                 on_refresh: Optional[Callable[[TaskList], None]] = None):
+        self.loader = loader
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.on_refresh = on_refresh
+        self.tasks: Optional[TaskList] = None
+        self.fetched_at: Optional[float] = None
+        self.version = 0
+        self._inflight: Optional[asyncio.Task] = None
+
+    def age(self) -> Optional[float]:
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+
+    def is_stale(self) -> bool:
+        age = self.age()
+        return age is None or age > self.max_age
+
+    async def _load(self) -> TaskList:
+        tasks = await self.loader()
+        self.tasks = tasks
+        self.fetched_at = time.time()
+        self.version += 1
+        if self.on_refresh:
+            self.on_refresh(tasks)
+        return tasks
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._load())
+            self._inflight.add_done_callback(_log_refresh_error)
+        return self._inflight
+
+    async def refresh(self) -> TaskList:
+        """
+        Waits for a fresh snapshot, joining the in-flight refresh if there is one.
+        """
+        # Shield so a cancelled caller doesn't cancel the load for everyone else
+        return await asyncio.shield(self._start_refresh())
+
+    def trigger_refresh(self) -> None:
+        self._start_refresh()
+
+    async def get(self) -> Tuple[TaskList, float]:
+        """
+        Returns (tasks, age_seconds). Only the very first call waits for a load.
+        """
+        if self.tasks is None:
+            await self.refresh()
+        elif self.is_stale():
+            self.trigger_refresh()
+        return self.tasks, self.age() or 0.0
+
+    def remove_task(self, task_id: str) -> None:
+        if self.tasks is not None:
+            self.tasks = [t for t in self.tasks if str(t["id"]) != str(task_id)]
+            self.version += 1
+
+    async def run(self) -> None:
+        """
+        Background refresher: loads immediately, then every refresh_interval seconds.
+        """
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass  # already logged; keep serving the previous snapshot
+            await asyncio.sleep(self.refresh_interval)
+
+def _log_refresh_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Task snapshot refresh failed: {task.exception()}")
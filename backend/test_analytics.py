@@ -0,0 +1,83 @@
+import asyncio
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+from backend import main
+from backend.analytics import AnalyticsEngine
+from backend.database import DataStore
+from backend.workspaces import DEFAULT_WORKSPACE, Workspace
+
+def make_store() -> DataStore:
+    return DataStore(Path(tempfile.mkdtemp()))
+
+def test_empty_and_inverted():
+    print("Testing AnalyticsEngine with no history and an inverted range...")
+    engine = AnalyticsEngine(make_store().read_log_since)
+    summary = engine.summary()
+    assert summary["time_by_category"]["totals"] == {}
+    assert len(summary["time_by_category"]["daily"]) == 28
+    assert summary["pauses"]["count"] == 0 and summary["pauses"]["per_session"] is None
+    assert summary["streaks"]["overall"] == {"current": 0, "longest": 0, "last_active": None}
+
+    today = date.today()
+    try:
+        engine.summary(since=today, until=today - timedelta(days=1))
+        assert False, "inverted range accepted"
+    except ValueError:
+        pass
+    print("SUCCESS: Empty history summarized; inverted range rejected.")
+
+def test_bucket_sums():
+    print("Testing that daily, weekly and total minutes agree...")
+    data = make_store()
+    now = time.time()
+    entries = [{"start_time": now - day * 86400 - 3600, "end_time": now - day * 86400,
+                "category": "Work" if day % 3 else "Study", "actual_duration": 10 + day}
+               for day in range(20)]
+    data.append_log("history", entries)
+    data.append_log("pause_log", [{"timestamp": now - 600, "pause_duration": 90, "category": "Work"}])
+
+    summary = AnalyticsEngine(data.read_log_since).summary()
+    buckets = summary["time_by_category"]
+    for category in ("Work", "Study"):
+        expected = sum(e["actual_duration"] for e in entries if e["category"] == category)
+        daily = sum(day.get(category, 0) for day in buckets["daily"].values())
+        weekly = sum(week.get(category, 0) for week in buckets["weekly"].values())
+        assert abs(daily - expected) < 1e-6 and abs(weekly - expected) < 1e-6, (category, daily, weekly, expected)
+        assert abs(buckets["totals"][category] - expected) < 1e-6
+    assert summary["pauses"]["count"] == 1 and summary["pauses"]["per_session"] == 0.05
+    assert summary["streaks"]["overall"]["longest"] == 20
+    print("SUCCESS: Buckets summed to the logged minutes.")
+
+async def run_endpoint():
+    registry = main.workspaces
+    registry.workspaces[DEFAULT_WORKSPACE] = Workspace(DEFAULT_WORKSPACE, make_store())
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            today = date.today()
+            response = await client.get("/analytics", params={"since": today.isoformat(),
+                                                              "until": (today - timedelta(days=1)).isoformat()})
+            assert response.status_code == 400, response.text
+            response = await client.get("/analytics", params={"since": (today + timedelta(days=1)).isoformat()})
+            assert response.status_code == 400, response.text
+
+            response = await client.get("/analytics")
+            assert response.status_code == 200, response.text
+            assert response.json()["time_by_category"]["totals"] == {}
+    finally:
+        registry.workspaces.pop(DEFAULT_WORKSPACE, None)
+
+def test_endpoint():
+    print("Testing /analytics status codes...")
+    asyncio.run(run_endpoint())
+    print("SUCCESS: Inverted ranges got 400, not 500.")
+
+if __name__ == "__main__":
+    test_empty_and_inverted()
+    test_bucket_sums()
+    test_endpoint()
@@ -0,0 +1,80 @@
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from backend import main
+from backend.database import DataStore
+from backend.fakes import FakeTodoistAPI, make_tasks
+from backend.workspaces import DEFAULT_WORKSPACE, Workspace
+
+def make_workspace() -> Workspace:
+    workspace = Workspace(DEFAULT_WORKSPACE, DataStore(Path(tempfile.mkdtemp())))
+    main.workspaces.workspaces[DEFAULT_WORKSPACE] = workspace
+    return workspace
+
+async def run_log_batches():
+    workspace = make_workspace()
+    workspace.log_writer.start()
+    limit = main.MAX_BATCH_SIZE
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # A single entry still queued is written before the batch that follows it
+            assert (await client.post("/history", json={"n": 0})).status_code == 200
+            response = await client.post("/history/batch", json=[{"n": 1}, {"n": 2}])
+            assert response.json() == {"status": "success", "count": 2}, response.text
+            # Answered only once on disk: readable without a flush
+            assert [e["n"] for e in workspace.data.read_log_since("history")[0]] == [0, 1, 2]
+
+            for path, log_name in (("/pause_log/batch", "pause_log"), ("/log_event/batch", "event_log")):
+                response = await client.post(path, json=[{"n": 1}, {"n": 2}, {"n": 3}])
+                assert response.json()["count"] == 3, response.text
+                assert len(workspace.data.read_log_since(log_name)[0]) == 3
+
+            main.MAX_BATCH_SIZE = 2
+            response = await client.post("/log_event/batch", json=[{"n": 4}, {"n": 5}, {"n": 6}])
+            assert response.status_code == 413, response.text
+            assert len(workspace.data.read_log_since("event_log")[0]) == 3
+    finally:
+        main.MAX_BATCH_SIZE = limit
+        await workspace.log_writer.stop()
+        main.workspaces.workspaces.pop(DEFAULT_WORKSPACE, None)
+
+async def run_complete_tasks():
+    workspace = make_workspace()
+    tasks = make_tasks(3, ["Work"], seed=0)
+    workspace.todoist.api = FakeTodoistAPI(tasks)
+    workspace.task_snapshot.tasks = [{"id": t.id, "content": t.content} for t in tasks]
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ids = [tasks[0].id, "missing", tasks[1].id, tasks[0].id]
+            response = await client.post("/tasks/complete", json={"task_ids": ids})
+            assert response.status_code == 200, response.text
+            body = response.json()
+            # One result per distinct id; a failed id doesn't fail the others
+            assert body["completed"] == 2 and body["failed"] == 1, body
+            assert body["results"] == [
+                {"task_id": tasks[0].id, "status": "success"},
+                {"task_id": "missing", "status": "error"},
+                {"task_id": tasks[1].id, "status": "success"},
+            ], body
+            assert [t["id"] for t in workspace.task_snapshot.tasks] == [tasks[2].id]
+    finally:
+        main.workspaces.workspaces.pop(DEFAULT_WORKSPACE, None)
+
+def test_log_batches():
+    print("Testing the batch log endpoints...")
+    asyncio.run(run_log_batches())
+    print("SUCCESS: Batches written in order and on disk before answering.")
+
+def test_complete_tasks():
+    print("Testing /tasks/complete with a partial failure...")
+    asyncio.run(run_complete_tasks())
+    print("SUCCESS: Each task reported on its own.")
+
+if __name__ == "__main__":
+    test_log_batches()
+    test_complete_tasks()
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from backend.database import DataStore
+from backend.fakes import FakeServerError
+from backend.gemini_client import (CategorizationService, LocalClassifier, ModelNotConfigured,
+                                   parse_batch_response, validate_batch_result)
+from backend.task_cache import TaskCategoryCache
+
+CATEGORIES = ["School", "Home"]
+
+def test_validate_batch_result():
+    print("Testing parse_batch_response and validate_batch_result...")
+    tasks = ["PSET 4", "Buy milk", "Call mom", "Read ch. 3"]
+    # Truncated mid-object: every complete pair is salvaged
+    raw = parse_batch_response('```json\n{"pset 4": "school.", "Buy  milk": "HOME", "Call mom": "Family", "Read ch')
+    assert raw == {"pset 4": "school.", "Buy  milk": "HOME", "Call mom": "Family"}, raw
+
+    valid, missing = validate_batch_result(raw, tasks, CATEGORIES)
+    # Titles and labels matched loosely, reported under the names we sent
+    assert valid == {"PSET 4": "School", "Buy milk": "Home"}, valid
+    # Unknown category and omitted title both need another try
+    assert missing == ["Call mom", "Read ch. 3"], missing
+
+    valid, missing = validate_batch_result({"Call mom": "uncategorized"}, ["Call mom"], CATEGORIES)
+    assert valid == {"Call mom": "Uncategorized"} and missing == []
+    print("SUCCESS: Responses validated against titles and categories.")
+
+def test_local_classifier():
+    print("Testing LocalClassifier...")
+    classifier = LocalClassifier(min_examples=20)
+    school = [f"Math problem set {i}" for i in range(12)] + [f"Physics lab report {i}" for i in range(12)]
+    home = [f"Buy groceries for week {i}" for i in range(12)] + [f"Clean the kitchen {i}" for i in range(12)]
+
+    # Too few examples: everything goes to the LLM
+    resolved, unresolved = classifier.classify(["Math problem set 99"], CATEGORIES)
+    assert resolved == {} and unresolved == ["Math problem set 99"]
+
+    assert classifier.partial_fit([(t, "School") for t in school] + [(t, "Home") for t in home]) == 48
+    assert classifier.partial_fit([(school[0], "School"), ("Unsure", "Uncategorized")]) == 0
+
+    resolved, unresolved = classifier.classify(["Math problem set 99", "Buy groceries for week 60", "Zyx qwv"], CATEGORIES)
+    assert resolved == {"Math problem set 99": "School", "Buy groceries for week 60": "Home"}, resolved
+    # Unfamiliar n-grams: not confident enough to skip the LLM
+    assert unresolved == ["Zyx qwv"], unresolved
+
+    # Only allowed categories are predicted
+    assert classifier.predict(["Buy groceries for week 60"], ["School"])[0][0] == "School"
+    assert classifier.stats()["local_hits"] == 2
+    print("SUCCESS: Confident titles resolved locally, the rest deferred.")
+
+async def run_retries():
+    calls = []
+
+    async def unconfigured(prompt: str) -> str:
+        calls.append("unconfigured")
+        raise ModelNotConfigured("GEMINI_API_KEY not configured")
+
+    async def flaky(prompt: str) -> str:
+        calls.append("flaky")
+        if calls.count("flaky") == 1:
+            raise FakeServerError("503")
+        return "Home"
+
+    # Configuration errors fail at once instead of backing off
+    service = CategorizationService(model=unconfigured, backoff_base=60.0, task_cache=lambda: None)
+    assert await asyncio.wait_for(service.categorize("Buy milk", CATEGORIES, cache={}), 1.0) == "Uncategorized"
+    assert calls == ["unconfigured"], calls
+
+    # Server errors are retried
+    service = CategorizationService(model=flaky, backoff_base=0.0, task_cache=lambda: None)
+    assert await service.categorize("Buy milk", CATEGORIES, cache={}) == "Home"
+    assert calls.count("flaky") == 2, calls
+
+def test_retries():
+    print("Testing which model errors are retried...")
+    asyncio.run(run_retries())
+    print("SUCCESS: Only transient errors were retried.")
+
+async def run_batch_sources():
+    cache = TaskCategoryCache(DataStore(Path(tempfile.mkdtemp())), near_duplicates=False)
+    # Distinct words: titles differing only in digits share one cache key
+    for word in ["algebra", "calculus", "geometry", "physics", "chemistry", "biology",
+                 "history", "essay", "lecture", "seminar", "reading", "quiz"]:
+        cache.put(f"Math problem set {word}", "School", CATEGORIES)
+        cache.put(f"Buy groceries for {word} night", "Home", CATEGORIES)
+
+    async def model(prompt: str) -> str:
+        return json.dumps({"Zyx qwv": "Home"})
+
+    service = CategorizationService(model=model, local_classifier=LocalClassifier(min_examples=20),
+                                    task_cache=lambda: cache)
+    sources = {}
+    result = await service.categorize_batch(["Math problem set 99", "Zyx qwv"], CATEGORIES, sources)
+    assert result == {"Math problem set 99": "School", "Zyx qwv": "Home"}, result
+    assert sources == {"Math problem set 99": "local", "Zyx qwv": "llm"}, sources
+
+def test_batch_sources():
+    print("Testing that batch results report where each label came from...")
+    asyncio.run(run_batch_sources())
+    print("SUCCESS: Local and LLM labels told apart.")
+
+if __name__ == "__main__":
+    test_validate_batch_result()
+    test_local_classifier()
+    test_retries()
+    test_batch_sources()
@@ -0,0 +1,61 @@
+import random
+
+from backend.decider import FenwickTree, TaskDecider
+
+def test_fenwick_tree():
+    print("Testing FenwickTree against prefix sums...")
+    rng = random.Random(1)
+    weights = [rng.choice([0.0, 0.5, 1.0, 3.0]) for _ in range(37)]
+    tree = FenwickTree(weights)
+    for _ in range(50):
+        index = rng.randrange(len(weights))
+        weights[index] = rng.choice([0.0, 2.0, 7.5])
+        tree.set(index, weights[index])
+        assert abs(tree.total() - sum(weights)) < 1e-9
+
+        # find() returns the first index whose prefix sum exceeds the value
+        value = rng.random() * tree.total()
+        prefix, expected = 0.0, None
+        for i, w in enumerate(weights):
+            prefix += w
+            if prefix > value:
+                expected = i
+                break
+        assert tree.find(value) == expected, (value, weights)
+        assert weights[tree.find(value)] > 0
+    print("SUCCESS: Totals and lookups matched a linear scan.")
+
+def test_task_decider():
+    print("Testing TaskDecider picks, completion and weight updates...")
+    tasks = [
+        {"id": "1", "content": "PSET 4", "category": "School", "priority": 1},
+        {"id": "2", "content": "PSET 5", "category": "School", "priority": 4},
+        {"id": "3", "content": "Groceries", "category": "Home", "priority": 1},
+        {"id": "4", "content": "Not configured", "category": "Other"},
+    ]
+    decider = TaskDecider(tasks, {"School": 3.0, "Home": 1.0, "Empty": 5.0})
+    rng = random.Random(0)
+
+    picks = [decider.pick(rng)["category"] for _ in range(4000)]
+    # Proportional to weight; categories without tasks never come up
+    assert set(picks) == {"School", "Home"}, set(picks)
+    assert 0.7 < picks.count("School") / len(picks) < 0.8, picks.count("School")
+
+    # Highest Todoist priority first within a category
+    school = next(p for p in iter(lambda: decider.pick(rng), None) if p["category"] == "School")
+    assert [t["id"] for t in [school["task"]] + school["related_tasks"]] == ["2", "1"]
+
+    decider.update_weights({"School": 0.0})
+    assert all(decider.pick(rng)["category"] == "Home" for _ in range(50))
+
+    # Completing the last Home task leaves only zero-weight School: uniform fallback
+    decider.complete("3")
+    assert decider.pick(rng)["category"] == "School"
+    decider.complete("1")
+    decider.complete("2")
+    assert decider.pick(rng) is None
+    print("SUCCESS: Picks followed the weights and updates.")
+
+if __name__ == "__main__":
+    test_fenwick_tree()
+    test_task_decider()
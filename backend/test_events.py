@@ -0,0 +1,95 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from backend import main
+from backend.database import DataStore
+from backend.events import EventBroker
+from backend.workspaces import DEFAULT_WORKSPACE, Workspace
+
+def test_broker_resume():
+    print("Testing EventBroker resume from Last-Event-ID...")
+    broker = EventBroker(buffer_size=3)
+    first = broker.publish("start", {"n": 1})
+    broker.publish("extend", {"n": 2})
+
+    # Resuming replays only what came after the client's id
+    _, backlog = broker.subscribe(broker.parse_id(broker.format_id(first)))
+    assert [(e[0], e[1]) for e in backlog] == [(2, "extend")], backlog
+    _, backlog = broker.subscribe(broker.last_event_id)
+    assert backlog == []
+
+    # Ids from another epoch (a restart, another worker) or malformed ones aren't ours
+    other = EventBroker()
+    assert broker.parse_id(other.format_id(first)) is None
+    assert broker.parse_id("garbage") is None and broker.parse_id(None) is None
+    # An id we never issued, or one that fell out of the buffer: resync
+    assert broker.subscribe(broker.last_event_id + 5)[1] is None
+    for n in range(3, 8):
+        broker.publish("extend", {"n": n})
+    assert broker.subscribe(first)[1] is None
+
+    # Live events reach every subscriber
+    queue, _ = broker.subscribe()
+    event_id = broker.publish("stop", {"n": 8})
+    assert queue.get_nowait()[:2] == (event_id, "stop")
+    print("SUCCESS: Backlog replayed after our ids; foreign and expired ids resynced.")
+
+def parse_stream(text: str):
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            events.append((fields.get("id"), fields["event"]))
+    return events
+
+async def read_stream(client: httpx.AsyncClient, broker: EventBroker, **kwargs):
+    async def close_soon():
+        await asyncio.sleep(0.1)
+        broker.close()
+
+    closer = asyncio.create_task(close_soon())
+    response = await client.get("/session/events", **kwargs)
+    await closer
+    return parse_stream(response.text)
+
+async def run_endpoint():
+    registry = main.workspaces
+    workspace = registry.workspaces[DEFAULT_WORKSPACE] = Workspace(DEFAULT_WORKSPACE, DataStore(Path(tempfile.mkdtemp())))
+    broker = workspace.session_events
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/session/start", json={"task_name": "A", "category": "Work",
+                                                                 "duration_minutes": 25, "start_time": time.time()})
+            assert response.status_code == 200, response.text
+            seen = broker.format_id(broker.last_event_id)
+            workspace.session_scheduler.stop()
+
+            # Known id in the header: just the missed stop event
+            events = await read_stream(client, broker, headers={"Last-Event-ID": seen})
+            assert events == [(broker.format_id(broker.last_event_id), "stop")], events
+
+            # Same id as a query parameter works too
+            events = await read_stream(client, broker, params={"last_event_id": seen})
+            assert [e[1] for e in events] == ["stop"], events
+
+            # Unknown epoch, or no id at all: a state snapshot first
+            for headers in ({"Last-Event-ID": "deadbeef-1"}, {}):
+                events = await read_stream(client, broker, headers=headers)
+                assert events == [(broker.format_id(broker.last_event_id), "state")], events
+    finally:
+        registry.workspaces.pop(DEFAULT_WORKSPACE, None)
+        workspace.session_scheduler.detach()
+
+def test_endpoint_resume():
+    print("Testing /session/events resume and resync...")
+    asyncio.run(run_endpoint())
+    print("SUCCESS: Streams resumed from our ids and resynced from foreign ones.")
+
+if __name__ == "__main__":
+    test_broker_resume()
+    test_endpoint_resume()
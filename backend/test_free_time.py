@@ -0,0 +1,37 @@
+import asyncio
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from backend.database import DataStore
+from backend.free_time import FreeTimeEngine
+
+async def run():
+    print("Testing FreeTimeEngine with a fake model...")
+    prompts = []
+
+    async def model(prompt: str) -> str:
+        prompts.append(prompt)
+        return json.dumps([{"title": "Build a plotter", "description": "From spare steppers."}])
+
+    engine = FreeTimeEngine(model, DataStore(Path(tempfile.mkdtemp())))
+    rng = random.Random(0)
+
+    # No ideas yet: even a certain roll doesn't offer free time
+    assert engine.offer(rng, 1.0) is None
+
+    assert await engine.regenerate()
+    assert engine.offer(rng, 1.0) == [{"title": "Build a plotter", "description": "From spare steppers."}]
+    assert engine.offer(rng, 0.0) is None
+
+    # Unchanged inputs: no second model call
+    assert not await engine.regenerate()
+    assert len(prompts) == 1, prompts
+    print("SUCCESS: Free time offered only once ideas existed.")
+
+def test():
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,132 @@
+import json
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+from backend.compaction import summarize_events
+from backend.database import JsonlLog, _save_json
+
+def make_log() -> JsonlLog:
+    return JsonlLog(Path(tempfile.mkdtemp()) / "history.jsonl")
+
+def test_torn_line_and_cursors():
+    print("Testing JsonlLog torn-line recovery and byte cursors...")
+    log = make_log()
+    log.append_many([{"n": 1}, {"n": 2}])
+    entries, cursor = log.read_from(0)
+    assert [e["n"] for e in entries] == [1, 2]
+
+    # A crash mid-append leaves a partial line: readers stop before it...
+    with open(log.path, "ab") as f:
+        f.write(b'{"n": 3, "tor')
+    assert log.read_from(cursor) == ([], cursor)
+
+    # ...and after a restart the next append starts on a fresh line
+    log = JsonlLog(log.path)
+    log.append({"n": 4})
+    entries, next_cursor = log.read_from(cursor)
+    assert [e["n"] for e in entries] == [4], entries
+    assert [e["n"] for e in log.read_all()] == [1, 2, 4]
+
+    # Cursors stay valid across a rotation
+    log.rotate(force=True)
+    log.append({"n": 5})
+    entries, _ = log.read_from(next_cursor)
+    assert [e["n"] for e in entries] == [5], entries
+    assert [e["n"] for e in log.read_all()] == [1, 2, 4, 5]
+    print("SUCCESS: Torn line skipped; cursors resumed across a restart and a rotation.")
+
+def test_legacy_migration():
+    print("Testing migration from the legacy JSON array...")
+    data_dir = Path(tempfile.mkdtemp())
+    legacy = data_dir / "history.json"
+    legacy.write_text(json.dumps([{"n": 1}, {"n": 2}]), encoding="utf-8")
+    log = JsonlLog(data_dir / "history.jsonl", legacy_path=legacy)
+    assert log.read_all() == [{"n": 1}, {"n": 2}]
+    assert not legacy.exists() and (data_dir / "history.json.migrated").exists()
+
+    # Only once: the live file is now the source of truth
+    log.append({"n": 3})
+    assert len(JsonlLog(data_dir / "history.jsonl", legacy_path=legacy).read_all()) == 3
+    print("SUCCESS: Legacy entries migrated once.")
+
+def test_query_pages():
+    print("Testing JsonlLog.query paging across archived segments...")
+    log = make_log()
+    log.append_many([{"timestamp": 1000 + i, "category": "A" if i % 2 else "B"} for i in range(6)])
+    log.rotate(force=True)
+    log.append_many([{"timestamp": 2000 + i, "category": "A"} for i in range(3)])
+
+    page, cursor = log.query(category="A", limit=2)
+    seen = [e["timestamp"] for e in page]
+    while cursor is not None:
+        page, cursor = log.query(category="A", limit=2, cursor=cursor)
+        seen += [e["timestamp"] for e in page]
+    assert seen == [1001, 1003, 1005, 2000, 2001, 2002], seen
+
+    page, _ = log.query(since=1004, until=2001)
+    assert [e["timestamp"] for e in page] == [1004, 1005, 2000]
+    assert log.query(category="A", limit=0) == ([], None)
+    print("SUCCESS: Pages and time ranges matched a full scan.")
+
+def test_compaction():
+    print("Testing compaction of old archived event segments...")
+    log = JsonlLog(Path(tempfile.mkdtemp()) / "event_log.jsonl")
+    old = time.time() - 200 * 86400
+    log.append_many([{"timestamp": old + i, "type": "pause", "category": "Work"} for i in range(5)])
+    log.rotate()  # started in an earlier month
+    log.append({"timestamp": time.time(), "type": "pause", "category": "Work"})
+    _, cursor = log.read_from(0)
+
+    assert log.compact(time.time() - 90 * 86400, summarize_events) == 1
+    entries = log.read_all()
+    assert len(entries) == 2, entries
+    assert entries[0]["type"] == "summary" and entries[0]["count"] == 5, entries[0]
+    assert log.segments()[0]["compacted"]
+
+    # Byte cursors past the compacted segment still work
+    log.append({"timestamp": time.time(), "type": "resume"})
+    entries, _ = log.read_from(cursor)
+    assert [e["type"] for e in entries] == ["resume"], entries
+    print("SUCCESS: Old events summarized; newer cursors unaffected.")
+
+def test_month_rotation():
+    print("Testing JsonlLog rotation across a month boundary...")
+    log = make_log()
+    log.append({"timestamp": time.time() - 40 * 86400, "category": "Old"})
+
+    # The first append this month archives last month's file...
+    log.append({"timestamp": time.time(), "category": "New"})
+    assert len(log.segments()) == 1, log.segments()
+
+    # ...and later ones stay in the new live file (even if it got the old inode back)
+    for i in range(5):
+        log.append({"timestamp": time.time(), "category": "New", "i": i})
+    assert len(log.segments()) == 1, log.segments()
+    assert len(log.path.read_text(encoding="utf-8").splitlines()) == 6
+    assert [e["category"] for e in log.read_all()] == ["Old"] + ["New"] * 6
+    print("SUCCESS: One segment per month; later appends stayed live.")
+
+def test_save_json_mode():
+    print("Testing that atomic JSON writes keep the file mode...")
+    path = Path(tempfile.mkdtemp()) / "config.json"
+    _save_json(path, {"a": 1})
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask, oct(path.stat().st_mode)
+
+    os.chmod(path, 0o640)
+    _save_json(path, {"a": 2})
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640, oct(path.stat().st_mode)
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": 2}
+    print("SUCCESS: New files follow the umask; existing files keep their mode.")
+
+if __name__ == "__main__":
+    test_torn_line_and_cursors()
+    test_legacy_migration()
+    test_query_pages()
+    test_month_rotation()
+    test_compaction()
+    test_save_json_mode()
@@ -0,0 +1,81 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from backend.fakes import RecordingNotifier
+from backend.scheduler import ActiveSession, SessionScheduler, SessionStore
+
+def make_session(name: str, seconds: float) -> ActiveSession:
+    return ActiveSession(task_name=name, category="Work", duration_minutes=seconds / 60, start_time=time.time())
+
+async def run():
+    print("Testing SessionScheduler with RecordingNotifier...")
+    notifier = RecordingNotifier()
+    scheduler = SessionScheduler(notifier)
+    scheduler.attach(asyncio.get_running_loop())
+
+    started = time.time()
+    a = scheduler.start(make_session("A", 0.2), replace=False)
+    scheduler.start(make_session("B", 0.1), replace=False)
+    c = scheduler.start(make_session("C", 0.15), replace=False)
+    scheduler.stop(c.session_id)
+    scheduler.extend(a.session_id, 0.2 / 60)
+
+    await asyncio.sleep(0.6)
+    assert notifier.messages == ["Time's up! B is done.", "Time's up! A is done."], notifier.messages
+    # Fires at the deadline, not on a polling interval
+    assert abs(notifier.times[0] - started - 0.1) < 0.05, notifier.times[0] - started
+    assert abs(notifier.times[1] - started - 0.4) < 0.05, notifier.times[1] - started
+    assert scheduler._handle is None
+
+    scheduler.detach()
+    print("SUCCESS: Sessions expired on time.")
+
+async def run_shared():
+    print("Testing two workers sharing a SessionStore...")
+    path = Path(tempfile.mkdtemp()) / "sessions.json"
+    leader_notifier, follower_notifier = RecordingNotifier(), RecordingNotifier()
+    follower_events = []
+    leader = SessionScheduler(leader_notifier, store=SessionStore(path))
+    follower = SessionScheduler(follower_notifier, on_event=lambda t, d: follower_events.append(t), store=SessionStore(path))
+    leader.attach(asyncio.get_running_loop(), leader=True)
+    follower.attach(asyncio.get_running_loop(), leader=False)
+
+    # Started on the follower, expired by the leader once it picks the change up
+    session = follower.start(make_session("A", 0.1))
+    leader.refresh()
+    await asyncio.sleep(0.3)
+    assert leader_notifier.messages == ["Time's up! A is done."], leader_notifier.messages
+    assert follower_notifier.messages == []
+    assert follower.current().notified
+
+    leader.stop(session.session_id)
+    follower.refresh()
+    assert follower.current() is None
+    assert follower_events == ["start", "timeout", "stop"], follower_events
+
+    leader.detach()
+    follower.detach()
+    print("SUCCESS: Only the leader notified; the follower saw every change.")
+
+def test_replace_emits_stop():
+    print("Testing that replaced sessions emit stop events...")
+    events = []
+    scheduler = SessionScheduler(RecordingNotifier(), on_event=lambda t, d: events.append((t, d["session"]["task_name"])))
+    a = scheduler.start(make_session("A", 60))
+    scheduler.start(make_session("B", 60))
+    assert events == [("start", "A"), ("stop", "A"), ("start", "B")], events
+    assert a.session_id not in scheduler.sessions
+    print("SUCCESS: Replaced session stopped before the new one started.")
+
+def test():
+    asyncio.run(run())
+
+def test_shared_store():
+    asyncio.run(run_shared())
+
+if __name__ == "__main__":
+    test()
+    test_shared_store()
+    test_replace_emits_stop()
@@ -0,0 +1,86 @@
+import asyncio
+
+from backend.task_snapshot import TaskSnapshot
+
+async def run_single_flight():
+    calls = []
+    release = asyncio.Event()
+
+    async def loader():
+        calls.append(len(calls))
+        await release.wait()
+        return [{"id": str(len(calls))}]
+
+    snapshot = TaskSnapshot(loader)
+    waiters = [asyncio.create_task(snapshot.get()) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    # Ten concurrent first calls, one fetch, one shared result
+    assert calls == [0], calls
+    assert all(tasks == [{"id": "1"}] for tasks, _ in results), results
+
+    # A cancelled caller doesn't cancel the load the others are waiting on
+    release.clear()
+    snapshot.fetched_at = None
+    cancelled = asyncio.create_task(snapshot.refresh())
+    joined = asyncio.create_task(snapshot.refresh())
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    release.set()
+    assert await joined == [{"id": "2"}]
+    assert len(calls) == 2
+
+async def run_stale_while_revalidate():
+    release = asyncio.Event()
+    refreshed = []
+    version = 0
+
+    async def loader():
+        nonlocal version
+        version += 1
+        if version > 1:
+            await release.wait()
+        return [{"id": "1", "version": version}]
+
+    snapshot = TaskSnapshot(loader, max_age=60.0, on_refresh=refreshed.append)
+    tasks, _ = await snapshot.get()
+    assert tasks[0]["version"] == 1
+
+    # Stale: served at once while the refresh runs in the background
+    snapshot.fetched_at -= 120
+    tasks, age = await asyncio.wait_for(snapshot.get(), 0.1)
+    assert tasks[0]["version"] == 1 and age > 60
+    tasks, _ = await asyncio.wait_for(snapshot.get(), 0.1)
+    assert tasks[0]["version"] == 1 and version == 2  # still the one refresh
+
+    release.set()
+    await asyncio.sleep(0.01)
+    tasks, age = await snapshot.get()
+    assert tasks[0]["version"] == 2 and age < 1
+    assert [t[0]["version"] for t in refreshed] == [1, 2]
+
+    # A failed refresh keeps serving the previous snapshot
+    async def failing():
+        raise RuntimeError("Todoist down")
+
+    snapshot.loader = failing
+    snapshot.fetched_at -= 120
+    tasks, _ = await snapshot.get()
+    await asyncio.sleep(0.01)
+    assert tasks[0]["version"] == 2 and snapshot.tasks[0]["version"] == 2
+
+def test_single_flight():
+    print("Testing TaskSnapshot single-flight loads...")
+    asyncio.run(run_single_flight())
+    print("SUCCESS: Concurrent callers shared one fetch.")
+
+def test_stale_while_revalidate():
+    print("Testing TaskSnapshot stale-while-revalidate...")
+    asyncio.run(run_stale_while_revalidate())
+    print("SUCCESS: Stale snapshot served while the refresh ran.")
+
+if __name__ == "__main__":
+    test_single_flight()
+    test_stale_while_revalidate()
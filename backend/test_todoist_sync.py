@@ -0,0 +1,42 @@
+import asyncio
+
+from backend.fakes import FakeSyncTransport
+from backend.todoist_client import TaskMirror
+
+async def run():
+    print("Testing TaskMirror against FakeSyncTransport...")
+    server = FakeSyncTransport([
+        {"id": "1", "content": "Finish MechE PSET 4"},
+        {"id": "2", "content": "Satellite simulation update"},
+    ])
+    mirror = TaskMirror(server)
+
+    changed = await mirror.sync()
+    assert changed == {"1", "2"}, changed
+    mirror.items["1"]["category"] = "Homework"
+
+    # Nothing changed: empty delta, categories are kept
+    assert await mirror.sync() == set()
+    assert mirror.items["1"]["category"] == "Homework"
+
+    server.rename_task("2", "Satellite simulation v2")
+    server.add_task("3", "Buy milk")
+    server.complete_task("1")
+    changed = await mirror.sync()
+    assert changed == {"2", "3"}, changed
+    assert set(mirror.items) == {"2", "3"}
+
+    # Invalidated token falls back to a full sync
+    server.invalidate_tokens()
+    changed = await mirror.sync()
+    assert server.calls[-1] == "*"
+    assert changed == set(), changed
+    assert [t["content"] for t in mirror.tasks()] == ["Satellite simulation v2", "Buy milk"]
+
+    print("SUCCESS: Mirror applied deltas correctly.")
+
+def test():
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,60 @@
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from backend import main, workspaces
+from backend.database import DataStore
+from backend.workspaces import DEFAULT_WORKSPACE, Workspace
+
+async def run():
+    root = Path(tempfile.mkdtemp())
+    (root / "workspaces" / "alice").mkdir(parents=True)
+    (root / "workspaces" / "bob").mkdir()
+    registry = main.workspaces
+    workspaces_dir = workspaces.WORKSPACES_DIR
+    workspaces.WORKSPACES_DIR = root / "workspaces"
+    registry.workspaces[DEFAULT_WORKSPACE] = Workspace(DEFAULT_WORKSPACE, DataStore(root))
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert registry.names() == ["default", "alice", "bob"], registry.names()
+
+            # Path prefix and header reach the same workspace
+            response = await client.post("/w/alice/history/batch", json=[{"timestamp": 1700000000, "category": "A"}])
+            assert response.status_code == 200, response.text
+            response = await client.post("/history/batch", headers={"X-Kairos-Workspace": "Alice"},
+                                         json=[{"timestamp": 1700000100, "category": "A"}])
+            assert response.status_code == 200, response.text
+            assert len((await client.get("/w/alice/history")).json()) == 2
+            assert len((await client.get("/history", headers={"X-Kairos-Workspace": "alice"})).json()) == 2
+
+            # Nothing crosses into the default or another workspace
+            assert (await client.get("/history")).json() == []
+            assert (await client.get("/w/bob/history")).json() == []
+            await client.post("/w/bob/config", json={"categories": [{"name": "Bob only"}]})
+            assert (await client.get("/w/bob/config")).json()["categories"] == [{"name": "Bob only"}]
+            assert (await client.get("/w/alice/config")).json().get("categories") != [{"name": "Bob only"}]
+            assert (root / "workspaces" / "alice" / "history.jsonl").exists()
+            assert not (root / "history.jsonl").exists()
+            assert not (root / "workspaces" / "bob" / "history.jsonl").exists()
+
+            # Unknown or invalid names are 404s, and requests never create directories
+            for path, headers in (("/w/carol/history", {}), ("/history", {"X-Kairos-Workspace": "carol"}),
+                                  ("/history", {"X-Kairos-Workspace": "../alice"}), ("/w/-bad/history", {})):
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 404, (path, headers, response.status_code)
+            assert not (root / "workspaces" / "carol").exists()
+    finally:
+        workspaces.WORKSPACES_DIR = workspaces_dir
+        for name in (DEFAULT_WORKSPACE, "alice", "bob"):
+            registry.workspaces.pop(name, None)
+
+def test():
+    print("Testing workspace routing and isolation...")
+    asyncio.run(run())
+    print("SUCCESS: Requests reached only their own workspace.")
+
+if __name__ == "__main__":
+    test()
@@ -1,15 +1,146 @@
+import asyncio
 import os
-from typing import List, Dict, Any, Optional
-from todoist_api_python.api_async import TodoistAPIAsync
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Dict, Any, Optional, Set, Tuple
+from . import metrics
+
+if TYPE_CHECKING:
+    import httpx
+    from todoist_api_python.api_async import TodoistAPIAsync
+
+SYNC_URL = "https://api.todoist.com/api/v1/sync"
+
+# "incremental" keeps a local mirror updated from Sync API deltas; anything else
+# pulls the full active task list through the REST client on every refresh.
+SYNC_MODE = os.environ.get("KAIROS_TODOIST_SYNC", "full").lower()
+
+# Todoist requests in flight at once for bulk operations
+BULK_CONCURRENCY = int(os.environ.get("KAIROS_TODOIST_CONCURRENCY", "8"))
+
+class SyncTokenInvalid(Exception):
+    """
+    Raised by a sync transport when the server no longer accepts our sync token.
+    """
+
+SyncTransport = Callable[[str], Awaitable[Dict[str, Any]]]
+
+class HttpSyncTransport:
+    """
+    Calls the Todoist Sync API for item changes since `sync_token` ("*" = everything).
+    """
+
+    def __init__(self, token: str, client: Optional["httpx.AsyncClient"] = None):
+        self.token = token
+        self._client = client
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+
+    async def __call__(self, sync_token: str) -> Dict[str, Any]:
+        response = await self.client.post(
+            SYNC_URL,
+            headers={"Authorization": f"Bearer {self.token}"},
+            data={"sync_token": sync_token, "resource_types": '["items"]'},
+        )
+        if sync_token != "*" and response.status_code in (400, 410):
+            raise SyncTokenInvalid(response.text)
+        response.raise_for_status()
+        return response.json()
+
+def simplify_sync_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Same shape as the REST tasks returned by fetch_active_tasks.
+    """
+    due = item.get("due") or None
+    return {
+        "id": str(item["id"]),
+        "content": item.get("content", ""),
+        "due": due.get("string") if due else None,
+        "due_date": due.get("date") if due else None,
+        "priority": item.get("priority", 1),
+        "provider": "todoist"
+    }
+
+class TaskMirror:
+    """
+    Local copy of active Todoist tasks keyed by id, kept current by applying only
+    the delta since the last sync token. Falls back to a full sync when the token
+    is rejected.
+    """
+
+    def __init__(self, transport: SyncTransport):
+        self.transport = transport
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self.sync_token = "*"
+
+    async def sync(self) -> Set[str]:
+        """
+        Pulls and applies the next delta. Returns the ids of tasks that are new or
+        whose content changed, i.e. the ones that may need (re)categorization.
+        """
+        try:
+            response = await self.transport(self.sync_token)
+        except SyncTokenInvalid:
+            print("Todoist sync token rejected, doing a full sync.")
+            self.sync_token = "*"
+            response = await self.transport(self.sync_token)
+        return self.apply(response)
+
+    def apply(self, response: Dict[str, Any]) -> Set[str]:
+        previous = self.items
+        if response.get("full_sync"):
+            self.items = {}
+
+        changed = set()
+        for item in response.get("items", []):
+            task_id = str(item["id"])
+            if item.get("is_deleted") or item.get("checked"):
+                self.items.pop(task_id, None)
+                continue
+
+            task = simplify_sync_item(item)
+            old = previous.get(task_id)
+            if old is None or old["content"] != task["content"]:
+                changed.add(task_id)
+            elif "category" in old:
+                # Unchanged title: keep the category it was already given
+                task["category"] = old["category"]
+            self.items[task_id] = task
+
+        self.sync_token = response.get("sync_token", self.sync_token)
+        return changed
+
+    def tasks(self) -> List[Dict[str, Any]]:
+        return list(self.items.values())
 
 class TodoistManager:
-    def __init__(self):
-        token = os.environ.get("TODOIST_API_KEY")
-        if not token:
+    def __init__(self, token: Optional[str] = None):
+        # None = the process environment's token (the default workspace)
+        self.token = os.environ.get("TODOIST_API_KEY") if token is None else token
+        self.mirror: Optional[TaskMirror] = None
+        self._api: Optional["TodoistAPIAsync"] = None
+        if not self.token:
             print("Warning: TODOIST_API_KEY not found in environment variables.")
-            self.api = None
-        else:
-            self.api = TodoistAPIAsync(token)
+        elif SYNC_MODE == "incremental":
+            self.mirror = TaskMirror(HttpSyncTransport(self.token))
+
+    @property
+    def api(self) -> Optional["TodoistAPIAsync"]:
+        """
+        REST client, created (and the SDK imported) on first use to keep startup fast.
+        """
+        if self._api is None and self.token:
+            from todoist_api_python.api_async import TodoistAPIAsync
+            self._api = TodoistAPIAsync(self.token)
+        return self._api
+
+    @api.setter
+    def api(self, value: Optional["TodoistAPIAsync"]) -> None:
+        self._api = value
 
     async def flatten_deep_async(self, nested_iterable):
         flat_list = []
@@ -31,6 +162,7 @@ class TodoistManager:
         if not self.api:
             return []
         
+        started = time.perf_counter()
         try:
             tasks_result = await self.api.get_tasks()
             
@@ -47,23 +179,61 @@ class TodoistManager:
                     "id": task.id,
                     "content": task.content,
                     "due": task.due.string if task.due else None,
+                    "due_date": str(task.due.date) if task.due else None,
                     "priority": task.priority,
                     "provider": "todoist" # Tag source
                 })
+            metrics.todoist_duration.observe(time.perf_counter() - started, "fetch")
             return simplified_tasks
         except Exception as e:
+            metrics.todoist_errors.inc("fetch")
             print(f"Error fetching Todoist tasks: {e}")
             with open("server_debug_error.txt", "a") as f:
                 f.write(f"Server Fetch Error: {type(e)} - {e}\n")
             return []
 
+    async def sync_tasks(self) -> Tuple[List[Dict[str, Any]], Optional[Set[str]]]:
+        """
+        Returns (tasks, changed_ids). In incremental mode only the tasks in
+        changed_ids are new or renamed; otherwise changed_ids is None, meaning
+        every task should be treated as possibly new.
+        """
+        if self.mirror is None:
+            return await self.fetch_active_tasks(), None
+
+        try:
+            with metrics.todoist_duration.time("sync"):
+                changed = await self.mirror.sync()
+            return self.mirror.tasks(), changed
+        except Exception as e:
+            metrics.todoist_errors.inc("sync")
+            print(f"Error syncing Todoist tasks incrementally, falling back to full fetch: {e}")
+            return await self.fetch_active_tasks(), None
+
     async def close_task(self, task_id: str) -> bool:
         if not self.api:
             return False
         
         try:
-            is_success = await self.api.close_task(task_id=task_id)
+            with metrics.todoist_duration.time("close"):
+                is_success = await self.api.close_task(task_id=task_id)
             return is_success
         except Exception as e:
+            metrics.todoist_errors.inc("close")
             print(f"Error closing Todoist task {task_id}: {e}")
             return False
+
+    async def close_tasks(self, task_ids: List[str]) -> Dict[str, bool]:
+        """
+        Closes several tasks concurrently, with at most BULK_CONCURRENCY requests
+        in flight over the API client's connection pool. Returns success per id.
+        """
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def close(task_id: str) -> bool:
+            async with semaphore:
+                return await self.close_task(task_id)
+
+        unique_ids = list(dict.fromkeys(task_ids))
+        results = await asyncio.gather(*(close(task_id) for task_id in unique_ids))
+        return dict(zip(unique_ids, results))
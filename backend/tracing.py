@@ -0,0 +1,178 @@
+import cProfile
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from .database import BASE_DIR, JsonlLog
+
+# Spans are recorded only with KAIROS_TRACE=1 (or for a profiled request);
+# otherwise span() is a context-variable lookup returning a shared no-op.
+TRACE_ENABLED = os.environ.get("KAIROS_TRACE", "0") == "1"
+TRACE_LOG_FILE = BASE_DIR / "trace.jsonl"
+PROFILE_DIR = BASE_DIR / "profiles"
+
+# Send this header (any value but "0") to profile a single request with cProfile
+PROFILE_HEADER = "x-kairos-profile"
+
+trace_log = JsonlLog(TRACE_LOG_FILE, fsync=False)
+
+class Trace:
+    """
+    Spans collected for one request (or one background job), written to the
+    trace log as a single JSON line when it finishes.
+    """
+
+    def __init__(self, name: str, request_id: str, caused_by: Optional[str] = None):
+        self.name = name
+        self.request_id = request_id
+        self.caused_by = caused_by
+        self.started = time.perf_counter()
+        self.start_time = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.attrs: Dict[str, Any] = {}
+
+    def record(self) -> Dict[str, Any]:
+        record = {
+            "request_id": self.request_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": self.spans,
+            **self.attrs,
+        }
+        if self.caused_by:
+            record["caused_by"] = self.caused_by
+        return record
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("kairos_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("kairos_span", default=None)
+_NO_SPAN = nullcontext()
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "started", "token")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        self.token = _current_span.set(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self.token)
+        span = {
+            "name": self.name,
+            "parent": _current_span.get(),
+            "offset_ms": round((self.started - self.trace.started) * 1000, 3),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+        if self.attrs:
+            span.update(self.attrs)
+        if exc_type is not None:
+            span["error"] = exc_type.__name__
+        self.trace.spans.append(span)
+
+def span(name: str, **attrs: Any):
+    """
+    Times the enclosed block as a span of the current trace, if there is one.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, attrs)
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+@contextmanager
+def start_trace(name: str, request_id: Optional[str] = None, force: bool = False) -> Iterator[Optional[Trace]]:
+    """
+    Starts a new trace for the enclosed block (a no-op unless tracing is enabled
+    or `force` is set). A trace started while another is active records the
+    other's request id as `caused_by`, e.g. a background refresh kicked off by
+    a request.
+    """
+    if not (TRACE_ENABLED or force):
+        yield None
+        return
+
+    trace = Trace(name, request_id or uuid.uuid4().hex[:16], caused_by=current_request_id())
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        try:
+            trace_log.append(trace.record())
+        except Exception as e:
+            print(f"Failed to write trace: {type(e).__name__}: {e}")
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")[:64]
+
+def _profile_path(method: str, path: str, request_id: str) -> str:
+    PROFILE_DIR.mkdir(exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{_slug(path) or 'root'}-{_slug(request_id)}.prof"
+    return str(PROFILE_DIR / name)
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving each request a trace (with KAIROS_TRACE=1) and
+    profiling requests that carry the X-Kairos-Profile header. The profile is
+    a cProfile dump of the event-loop thread for the duration of the request
+    (inspect with `python -m pstats` or snakeviz); its path is returned in
+    X-Profile-File.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        profile_header = headers.get(PROFILE_HEADER.encode(), b"0").decode()
+        profiling = profile_header not in ("", "0")
+        if not (TRACE_ENABLED or profiling):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get(b"x-request-id", b"").decode() or uuid.uuid4().hex[:16]
+        profile_path = _profile_path(scope["method"], scope["path"], request_id) if profiling else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                extra = [(b"x-request-id", request_id.encode())]
+                if profile_path:
+                    extra.append((b"x-profile-file", profile_path.encode()))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        with start_trace(f"{scope['method']} {scope['path']}", request_id, force=profiling) as trace:
+            profiler = cProfile.Profile() if profiling else None
+            if profiler:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Only one profiler can run at a time (concurrent profiled request)
+                    print("Profiler busy; request traced without a profile.")
+                    profiler = profile_path = None
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    profiler.dump_stats(profile_path)
+                    trace.attrs["profile"] = profile_path
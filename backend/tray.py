@@ -1,16 +1,45 @@
+import time
+
+# Process start, for the startup-time measurement
+STARTED_AT = time.perf_counter()
+
 import os
 import sys
 import threading
-import uvicorn
 import subprocess
-from PIL import Image, ImageDraw
-import pystray
-from pystray import MenuItem as item
+import urllib.request
+import uvicorn
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+PORT = 55544
+DASHBOARD_URL = f"http://localhost:{PORT}"
 
-# Flag to control server loop
+# KAIROS_DEV=1 runs uvicorn as a subprocess with --reload (file watcher, extra
+# process). The default production mode serves from a thread in this process.
+DEV_MODE = os.environ.get("KAIROS_DEV", "0") == "1"
+
+# Set once the server accepts connections
+server_ready = threading.Event()
+
+server = None
+server_thread = None
 server_process = None
 
+class ReadyServer(uvicorn.Server):
+    """
+    uvicorn server that signals `server_ready` (and logs the time since process
+    start) as soon as it is listening.
+    """
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            print(f"Kairos ready in {time.perf_counter() - STARTED_AT:.2f}s")
+            server_ready.set()
+
 def create_image(width=64, height=64, color1="orange", color2="black"):
+    from PIL import Image, ImageDraw
     # Generate an orange icon
     image = Image.new("RGB", (width, height), color1)
     dc = ImageDraw.Draw(image)
@@ -19,20 +48,48 @@ def create_image(width=64, height=64, color1="orange", color2="black"):
     return image
 
 def start_server():
-    # Run uvicorn programmatically or as subprocess
-    # Using subprocess allows cleaner termination usually
-    global server_process
-    # Assuming the current directory is root or backend parent
-    # We want to run: python -m uvicorn backend.main:app --port 55544
-    # Adjust path as necessary
-    cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", "55544", "--reload"]
-    server_process = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.dirname(__file__)))
+    global server, server_thread, server_process
+    if DEV_MODE:
+        cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", HOST, "--port", str(PORT), "--reload"]
+        server_process = subprocess.Popen(cmd, cwd=ROOT_DIR)
+        return
+
+    # Single process, no reload. The app (and its imports) load on the server
+    # thread, overlapping with the tray icon setup.
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    config = uvicorn.Config("backend.main:app", host=HOST, port=PORT, reload=False, log_level="warning")
+    server = ReadyServer(config)
+    server_thread = threading.Thread(target=server.run, name="kairos-server", daemon=True)
+    server_thread.start()
+
+def wait_until_ready(timeout: float = 30.0) -> bool:
+    """
+    Blocks until the server answers, or `timeout` seconds pass.
+    """
+    if not DEV_MODE:
+        return server_ready.wait(timeout)
+
+    # Subprocess: poll the health endpoint
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://{HOST}:{PORT}/api/health", timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
 
 def stop_server():
-    global server_process
+    global server, server_thread, server_process
     if server_process:
         server_process.terminate()
         server_process = None
+    if server:
+        server.should_exit = True
+        server_thread.join(timeout=10)
+        server = None
+        server_thread = None
 
 def on_quit(icon, item):
     icon.stop()
@@ -41,28 +98,54 @@ def on_quit(icon, item):
 
 def on_open(icon, item):
     # Open frontend in browser or configured window
-    # For now, just print
     print("Opening Dashboard...")
+    # Right after login the server may still be starting; wait only until it's up
+    if not wait_until_ready():
+        print("Backend did not become ready in time.")
+        return
     # Try to open as an app window with specific size (Chrome/Edge)
     # This is a best-effort attempt to set the size.
     try:
         # Check standard paths or just run command assuming it's in path
         # 'start' is cmd specific
-        cmd = 'start msedge --app=http://localhost:55544 --window-size=450,910'
+        cmd = f'start msedge --app={DASHBOARD_URL} --window-size=450,910'
         subprocess.Popen(cmd, shell=True)
     except:
-        subprocess.Popen(["start", "http://localhost:55544"], shell=True)
+        subprocess.Popen(["start", DASHBOARD_URL], shell=True)
 
 def setup_tray():
+    # Start the server first so it boots while the tray UI loads
+    start_server()
+
+    import pystray
+    from pystray import MenuItem as item
+
     icon_image = create_image()
     menu = (
         item('Open Dashboard', on_open),
         item('Exit', on_quit)
     )
     icon = pystray.Icon("Kairos", icon_image, "Kairos", menu)
-    
-    start_server()
     icon.run()
 
+def measure_startup():
+    """
+    Starts the server without the tray, reports the time to ready and to the
+    first answered request, then shuts down.
+    """
+    start_server()
+    if not wait_until_ready():
+        print("Backend did not become ready in time.")
+        sys.exit(1)
+    ready = time.perf_counter() - STARTED_AT
+    with urllib.request.urlopen(f"http://{HOST}:{PORT}/api/health", timeout=5):
+        pass
+    first_response = time.perf_counter() - STARTED_AT
+    print(f"Startup: ready {ready:.2f}s, first response {first_response:.2f}s ({'dev' if DEV_MODE else 'production'} mode)")
+    stop_server()
+
 if __name__ == "__main__":
-    setup_tray()
+    if "--measure-startup" in sys.argv:
+        measure_startup()
+    else:
+        setup_tray()
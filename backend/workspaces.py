@@ -0,0 +1,368 @@
+"""
+Workspaces: independent sets of data and in-memory state (one per person or
+context) served by a single backend.
+
+A request picks its workspace with the X-Kairos-Workspace header or a
+/w/<name>/ path prefix; without either it uses the default workspace, whose
+files live directly in the data directory. Other workspaces keep theirs in
+workspaces/<name>/ (config, task cache, logs or kairos.db, sessions,
+context.md), with that workspace's Todoist token in workspaces/<name>/.env.
+
+    python -m backend.workspaces create <name> [--todoist-token TOKEN]
+    python -m backend.workspaces list
+"""
+import argparse
+import asyncio
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from dotenv import dotenv_values
+from fastapi import HTTPException, Request
+
+from .analytics import AnalyticsEngine
+from .database import BASE_DIR, DataStore, default_store
+from .decider import TaskDecider
+from .events import EventBroker
+from .free_time import FreeTimeEngine
+from .gemini_client import CategorizationService, LocalClassifier
+from .locks import FileLock
+from .log_writer import LogWriter
+from .notifications import get_default_notifier
+from .rollups import TimeRollups, category_weights
+from .scheduler import SessionScheduler, SessionStore
+from .task_cache import TaskCategoryCache, get_task_category_cache
+from .task_snapshot import TaskSnapshot
+from .todoist_client import TodoistManager
+from . import metrics, tracing
+
+WORKSPACES_DIR = BASE_DIR / "workspaces"
+DEFAULT_WORKSPACE = "default"
+WORKSPACE_HEADER = "x-kairos-workspace"
+WORKSPACE_PREFIX = "/w/"
+# ASGI scope key the middleware stores the requested workspace name under
+SCOPE_KEY = "kairos.workspace"
+_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Each worker polls the session store this often to push other workers' changes
+# to its own event streams and to take over leadership. It always runs: the
+# worker count isn't reliably known (plain `uvicorn --workers N` sets no
+# variable) and an unchanged store costs one stat()
+SESSION_SYNC_INTERVAL = 1.0
+
+TASKS_MAX_AGE = float(os.environ.get("KAIROS_TASKS_MAX_AGE", "60"))
+TASKS_REFRESH_INTERVAL = float(os.environ.get("KAIROS_TASKS_REFRESH_INTERVAL", "300"))
+
+# One desktop for every workspace, so one notifier
+notifier = get_default_notifier()
+
+class Workspace:
+    """
+    Everything one workspace owns: its data store and, built on it, its own
+    task cache, rollups, analytics, Todoist client, categorizer, log writer,
+    task snapshot and decider, session scheduler (with its own leader lock and
+    event stream) and free-time engine. Nothing is shared between workspaces
+    except the process-wide Gemma client and desktop notifier.
+    """
+
+    def __init__(self, name: str, data: DataStore, todoist_token: Optional[str] = None):
+        self.name = name
+        self.data = data
+        self.rollups = TimeRollups(data.read_history_since)
+        self.analytics = AnalyticsEngine(data.read_log_since)
+        self.categorizer = CategorizationService(local_classifier=LocalClassifier(), task_cache=self.task_cache)
+        self.todoist = TodoistManager(todoist_token)
+
+        # Log endpoints enqueue; one background task group-commits (one write + fsync per log)
+        self.log_writer = LogWriter({
+            log_name: (lambda entries, log_name=log_name: data.append_log(log_name, entries, fsync=True))
+            for log_name in ("history", "pause_log", "event_log")
+        })
+
+        # Sessions live in sessions.json so every uvicorn worker sees the same state;
+        # only the worker holding the leader lock fires expiry timers
+        self.session_events = EventBroker()
+        self.session_scheduler = SessionScheduler(notifier, on_event=self.session_events.publish,
+                                                  store=SessionStore(data.sessions_file))
+        self.leader_lock = FileLock(data.data_dir / "scheduler.leader.lock")
+
+        self.free_time = FreeTimeEngine(self.categorizer.generate, data)
+
+        # Categorized tasks are served from a snapshot that is refreshed in the background
+        self.task_snapshot = TaskSnapshot(
+            self.load_categorized_tasks,
+            max_age=TASKS_MAX_AGE,
+            refresh_interval=TASKS_REFRESH_INTERVAL,
+            on_refresh=self.rebuild_task_decider,
+        )
+        # Built from the most recent snapshot, updated in place on completion
+        self.task_decider: Optional[TaskDecider] = None
+        self.task_decider_weights_key: Optional[tuple] = None
+        self.last_category_names: Optional[List[str]] = None
+
+        self.started = False
+        self._background: List[asyncio.Task] = []
+        self._rollups_warmup: Optional[asyncio.Task] = None
+
+    def task_cache(self) -> TaskCategoryCache:
+        return get_task_category_cache(self.data)
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        """
+        Starts the workspace's background work on the running event loop.
+        """
+        # Build the rollups from the full log off the event loop so startup doesn't
+        # wait on it; later reads catch up on appends only
+        self._rollups_warmup = asyncio.create_task(asyncio.to_thread(self.rollups.catch_up))
+        self._background.append(self._rollups_warmup)
+
+        self.log_writer.start()
+
+        # Session expirations fire from the leader's event loop at their exact deadlines
+        self.session_scheduler.attach(asyncio.get_running_loop(), leader=self.leader_lock.acquire(blocking=False))
+        self._background.append(asyncio.create_task(self.sync_sessions()))
+
+        # Keep the task snapshot warm so /tasks and /decide answer immediately
+        self._background.append(asyncio.create_task(self.task_snapshot.run()))
+
+        # Weekly free-time idea regeneration; /free_time only reads the cached ideas
+        self._background.append(asyncio.create_task(self.free_time.run()))
+        self.started = True
+
+    async def stop(self) -> None:
+        await self.log_writer.stop()
+        for task in self._background:
+            task.cancel()
+        self._background.clear()
+        self.session_scheduler.detach()
+        if self.session_scheduler.leader:
+            self.leader_lock.release()
+        self.session_events.close()
+        self.data.flush_caches()
+        self.started = False
+
+    async def sync_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(SESSION_SYNC_INTERVAL)
+            try:
+                self.session_scheduler.refresh()
+                if not self.session_scheduler.leader and self.leader_lock.acquire(blocking=False):
+                    print(f"Took over as session scheduler leader for workspace {self.name}.")
+                    self.session_scheduler.set_leader(True)
+            except Exception as e:
+                print(f"Error syncing sessions: {type(e).__name__}: {e}")
+
+    async def rollups_ready(self) -> None:
+        """
+        Waits for the startup rollups build. Until it finishes the rollups lock
+        is held for the whole history, so sync callers on the event loop must
+        not touch them.
+        """
+        if self._rollups_warmup is not None and not self._rollups_warmup.done():
+            await asyncio.shield(self._rollups_warmup)
+
+    # --- Decision engine ---
+
+    def current_category_weights(self) -> Dict[str, float]:
+        weights = category_weights(self.data.load_config(), self.rollups.week_totals())
+        return {w["name"]: w["weight"] for w in weights}
+
+    def rebuild_task_decider(self, tasks: List[Dict[str, Any]]) -> TaskDecider:
+        self.task_decider = TaskDecider(tasks, self.current_category_weights())
+        self.task_decider_weights_key = (self.rollups.version, id(self.data.load_config()))
+        return self.task_decider
+
+    async def load_categorized_tasks(self) -> List[Dict[str, Any]]:
+        """
+        Fetch tasks from Todoist, check cache for categories, and invoke Gemini for uncategorized ones.
+        """
+        # Usually runs as a background refresh, so it gets its own trace
+        with tracing.start_trace("load_categorized_tasks"):
+            return await self._load_categorized_tasks()
+
+    async def _load_categorized_tasks(self) -> List[Dict[str, Any]]:
+        # The decider is rebuilt from the rollups when this returns
+        await self.rollups_ready()
+
+        # 1. Fetch from Todoist (a delta only, in incremental sync mode)
+        with tracing.span("todoist.sync"):
+            tasks, changed_ids = await self.todoist.sync_tasks()
+
+        # 2. Categorize
+        config = self.data.load_config()
+        categories = [c["name"] for c in config.get("categories", [])]
+
+        # Mirrored tasks that kept their title keep their category, unless the
+        # category set itself changed since they were labelled
+        if changed_ids is not None and categories == self.last_category_names:
+            pending = [t for t in tasks if t["id"] in changed_ids or t.get("category", "Uncategorized") == "Uncategorized"]
+        else:
+            pending = tasks
+        self.last_category_names = categories
+
+        # Load cache ONCE (normalized titles, stale labels dropped lazily)
+        with tracing.span("cache.load"):
+            cache = self.task_cache()
+
+        # Identify miss
+        tasks_to_categorize = []
+
+        with tracing.span("cache.lookup", tasks=len(pending)):
+            for task in pending:
+                cached_category = cache.get(task["content"], categories)
+                if cached_category is not None:
+                    metrics.task_cache_lookups.inc("hit")
+                    task["category"] = cached_category
+                else:
+                    metrics.task_cache_lookups.inc("miss")
+                    if task["content"] not in tasks_to_categorize:
+                        tasks_to_categorize.append(task["content"])
+                    # Temporarily mark as Uncategorized until batch returns
+                    task["category"] = "Uncategorized"
+
+        # Batch Process
+        if tasks_to_categorize:
+            print(f"Batch categorizing {len(tasks_to_categorize)} tasks...")
+            with tracing.span("categorize", titles=len(tasks_to_categorize)):
+                sources: Dict[str, str] = {}
+                new_categories = await self.categorizer.categorize_batch(tasks_to_categorize, categories, sources)
+
+            # Merge results back, tagged so local predictions aren't trained on
+            for title, category in new_categories.items():
+                cache.put(title, category, categories, sources[title])
+            for task in pending:
+                if task["content"] in new_categories:
+                    task["category"] = new_categories[task["content"]]
+
+        # Save cache if changed (write-behind)
+        with tracing.span("cache.save"):
+            cache.save()
+
+        return tasks
+
+def is_valid_name(name: str) -> bool:
+    return bool(_NAME_PATTERN.match(name))
+
+def create_workspace(name: str) -> Workspace:
+    if name == DEFAULT_WORKSPACE:
+        # Data directly under BASE_DIR, Todoist token from the process environment
+        return Workspace(name, default_store)
+    data_dir = WORKSPACES_DIR / name
+    token = dotenv_values(data_dir / ".env").get("TODOIST_API_KEY") or ""
+    if not token:
+        print(f"Warning: no TODOIST_API_KEY in {data_dir / '.env'}; workspace {name} has no Todoist tasks.")
+    return Workspace(name, DataStore(data_dir), token)
+
+class WorkspaceRegistry:
+    """
+    The workspaces this process serves, created on first use. Only workspaces
+    that have a directory under workspaces/ exist; requests can't create them.
+    """
+
+    def __init__(self):
+        self.workspaces: Dict[str, Workspace] = {}
+        self.running = False
+
+    def names(self) -> List[str]:
+        existing = [p.name for p in WORKSPACES_DIR.iterdir() if p.is_dir() and is_valid_name(p.name)] \
+            if WORKSPACES_DIR.is_dir() else []
+        return [DEFAULT_WORKSPACE] + sorted(n for n in existing if n != DEFAULT_WORKSPACE)
+
+    def get(self, name: Optional[str] = None) -> Optional[Workspace]:
+        """
+        The named workspace (default if None), started if the app is running.
+        None if no such workspace exists.
+        """
+        name = (name or DEFAULT_WORKSPACE).lower()
+        workspace = self.workspaces.get(name)
+        if workspace is None:
+            if name != DEFAULT_WORKSPACE and not (is_valid_name(name) and (WORKSPACES_DIR / name).is_dir()):
+                return None
+            workspace = self.workspaces[name] = create_workspace(name)
+        if self.running and not workspace.started:
+            workspace.start()
+        return workspace
+
+    @property
+    def default(self) -> Workspace:
+        return self.get(DEFAULT_WORKSPACE)
+
+    def start(self) -> None:
+        """
+        Starts every existing workspace, so persisted session timers fire
+        without waiting for a request.
+        """
+        self.running = True
+        for name in self.names():
+            self.get(name)
+
+    async def stop(self) -> None:
+        self.running = False
+        for workspace in self.workspaces.values():
+            if workspace.started:
+                await workspace.stop()
+
+class WorkspaceMiddleware:
+    """
+    ASGI middleware recording the requested workspace in the scope: from a
+    /w/<name>/ path prefix (stripped before routing, so /w/alice/tasks is
+    /tasks in workspace "alice") or from the X-Kairos-Workspace header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            # Updated in place, like the router does, so outer middleware (metrics)
+            # still sees the matched route
+            path = scope["path"]
+            if path.startswith(WORKSPACE_PREFIX):
+                name, _, rest = path[len(WORKSPACE_PREFIX):].partition("/")
+                scope["path"] = "/" + rest
+                scope["raw_path"] = scope["path"].encode()
+            else:
+                headers = dict(scope.get("headers") or [])
+                name = headers.get(WORKSPACE_HEADER.encode(), b"").decode()
+            scope[SCOPE_KEY] = name or None
+        await self.app(scope, receive, send)
+
+# Process-wide registry used by the API
+workspaces = WorkspaceRegistry()
+
+async def current_workspace(request: Request) -> Workspace:
+    """
+    FastAPI dependency: the request's workspace (404 if it doesn't exist).
+    """
+    workspace = workspaces.get(request.scope.get(SCOPE_KEY))
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Unknown workspace")
+    return workspace
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="create a workspace directory")
+    create.add_argument("name")
+    create.add_argument("--todoist-token", help="written to the workspace's .env")
+    commands.add_parser("list", help="list workspaces")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in WorkspaceRegistry().names():
+            print(name)
+        return
+
+    name = args.name.lower()
+    if name == DEFAULT_WORKSPACE or not is_valid_name(name):
+        parser.error("workspace names are 1-64 of a-z, 0-9, '_' and '-' (and not 'default')")
+    data_dir = WORKSPACES_DIR / name
+    data_dir.mkdir(parents=True, exist_ok=True)
+    if args.todoist_token:
+        (data_dir / ".env").write_text(f"TODOIST_API_KEY={args.todoist_token}\n", encoding="utf-8")
+    print(f"Workspace {name} ready in {data_dir}")
+
+if __name__ == "__main__":
+    main()